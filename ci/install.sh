@@ -26,8 +26,13 @@ if [[ "$DISTRIB" == "conda" ]]; then
 	conda update conda
 	conda info -a
 
-	conda create -n testenv python=$PYTHON_VERSION --file ci/requirements.txt
+	# conda does not understand environment markers, which are left to pip
+	grep -v ';' ci/requirements.txt > conda-requirements.txt
+	conda create -n testenv python=$PYTHON_VERSION --file conda-requirements.txt
     source activate testenv
+	grep ';' ci/requirements.txt | while read -r requirement; do
+		pip install "$requirement"
+	done
 fi
 
 if [[ "$COVERAGE" == "true" ]]; then
@@ -0,0 +1,340 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Chunked, compressed archives of decompositions.
+
+An archive is a single file holding every IMF, the residue and the time
+instants as a sequence of independently compressed chunks of
+``chunk_size`` samples, followed by a JSON index of the chunks and of the
+metadata of the decomposition (iteration counts, parameters, index of
+orthogonality), and by a fixed-size footer pointing at the index. Chunks
+are written as soon as each mode is extracted, and reading a range of
+samples of some of the IMFs only decompresses the chunks which overlap it.
+"""
+
+import os
+import json
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"PYHHTAR1"
+_FOOTER = struct.Struct("<Q8s")
+
+
+def _codec(name, level=None):
+    """Compression and decompression functions of a codec."""
+    if name == "zlib":
+        level = 6 if level is None else level
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+    if name == "lzma":
+        import lzma
+        preset = 6 if level is None else level
+        return (lambda data: lzma.compress(data, preset=preset)), \
+            lzma.decompress
+    if name == "none":
+        return bytes, bytes
+    raise ValueError("Unknown compression: {0}".format(name))
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ArchiveWriter(object):
+    """Write a decomposition to an archive, one mode at a time.
+
+    The archive is written to a temporary file, which replaces ``path``
+    when :meth:`close` is called, so readers never see a partial archive.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+
+    chunk_size : int
+        Number of samples per chunk. (Default: 65536)
+
+    compression : str
+        ``'zlib'``, ``'lzma'`` or ``'none'``. (Default: ``'zlib'``)
+
+    level : int
+        Compression level, or preset of ``'lzma'``. (Default: 6)
+
+    Example
+    -------
+    >>> with ArchiveWriter("decomposition.hht") as writer:
+    ...     for imf, nbit, elapsed in decomposer.iter_imfs():
+    ...         writer.write_imf(imf)
+    ...     writer.write_residue(decomposer.residue)
+    ...     writer.close(t=decomposer.t, nbits=decomposer.nbits)
+    """
+
+    def __init__(self, path, chunk_size=65536, compression="zlib", level=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self._compress = _codec(compression, level)[0]
+        self._tmp = path + ".tmp"
+        self._fid = open(self._tmp, "wb")
+        self._fid.write(MAGIC)
+        self._rows = []
+        self._arrays = {}
+        self._residue = None
+        self.n_samples = None
+
+    def _write_array(self, x):
+        x = np.ascontiguousarray(x)
+        if self.n_samples is None:
+            self.n_samples = x.shape[0]
+        elif x.shape[0] != self.n_samples:
+            raise ValueError("All the rows of an archive must have "
+                             "{0} samples.".format(self.n_samples))
+        chunks = []
+        for start in range(0, x.shape[0], self.chunk_size):
+            data = self._compress(x[start:start + self.chunk_size].tobytes())
+            chunks.append((self._fid.tell(), len(data)))
+            self._fid.write(data)
+        return {"dtype": x.dtype.str, "chunks": chunks}
+
+    def write_imf(self, imf):
+        """Append an IMF to the archive."""
+        self._rows.append(self._write_array(imf))
+
+    def write_residue(self, residue):
+        """Write the residue of the decomposition."""
+        self._residue = self._write_array(residue)
+
+    def close(self, t=None, nbits=None, params=None, ort=None):
+        """Write the index and the metadata, and move the archive in place.
+
+        Parameters
+        ----------
+        t : array-like
+            Sampling time instants. (Default: ``None``)
+
+        nbits : list
+            Number of sifting iterations of each IMF. (Default: ``None``)
+
+        params : dict
+            Parameters of the decomposition, as returned by
+            :meth:`pyhht.emd.EMD.get_params`. Array values are stored as
+            chunked arrays. (Default: ``None``)
+
+        ort : float
+            Index of orthogonality. (Default: ``None``)
+        """
+        if self._fid is None:
+            return
+        index = {"n_samples": self.n_samples, "chunk_size": self.chunk_size,
+                 "compression": self.compression, "rows": self._rows,
+                 "residue": self._residue, "t": None, "ort": _to_json(ort),
+                 "nbits": None, "params": {}, "arrays": {}}
+        if t is not None:
+            index["t"] = self._write_array(t)
+        if nbits is not None:
+            index["nbits"] = [int(n) for n in nbits]
+        for name, value in (params or {}).items():
+            if isinstance(value, np.ndarray):
+                index["arrays"][name] = self._write_array(value)
+            else:
+                index["params"][name] = _to_json(value)
+        offset = self._fid.tell()
+        self._fid.write(json.dumps(index).encode("utf-8"))
+        self._fid.write(_FOOTER.pack(offset, MAGIC))
+        self._fid.close()
+        self._fid = None
+        os.rename(self._tmp, self.path)
+
+    def abort(self):
+        """Discard the archive."""
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class DecompositionArchive(object):
+    """Read a decomposition from an archive.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+
+    Attributes
+    ----------
+    n_imfs : int
+        Number of IMFs, not counting the residue.
+
+    n_samples : int
+        Length of the decomposed signal.
+
+    nbits : list
+        Number of sifting iterations of each IMF, if stored.
+
+    params : dict
+        Parameters of the decomposition, if stored.
+
+    ort : float
+        Index of orthogonality, if stored.
+
+    Example
+    -------
+    >>> with DecompositionArchive("decomposition.hht") as archive:
+    ...     modes = archive.read([0, 1], start=3600000, stop=7200000)
+    ...     t = archive.time(3600000, 7200000)
+    """
+
+    def __init__(self, path):
+        self._fid = open(path, "rb")
+        self._fid.seek(-_FOOTER.size, os.SEEK_END)
+        offset, magic = _FOOTER.unpack(self._fid.read(_FOOTER.size))
+        if magic != MAGIC:
+            self._fid.close()
+            raise ValueError("{0} is not a decomposition archive.".format(path))
+        self._fid.seek(offset)
+        end = os.fstat(self._fid.fileno()).st_size - _FOOTER.size
+        index = json.loads(self._fid.read(end - offset).decode("utf-8"))
+        self._index = index
+        self._decompress = _codec(index["compression"])[1]
+        self._rows = index["rows"]
+        if index["residue"] is not None:
+            self._rows = self._rows + [index["residue"]]
+        self.n_imfs = len(index["rows"])
+        self.n_samples = index["n_samples"]
+        self.chunk_size = index["chunk_size"]
+        self.nbits = index["nbits"]
+        self.ort = index["ort"]
+        self.params = dict(index["params"])
+        for name, entry in index["arrays"].items():
+            self.params[name] = self._read_array(entry)
+
+    def _read_array(self, entry, start=0, stop=None):
+        if stop is None:
+            stop = self.n_samples
+        dtype = np.dtype(entry["dtype"])
+        first = start // self.chunk_size
+        last = max((stop - 1) // self.chunk_size, first - 1)
+        parts = []
+        for offset, length in entry["chunks"][first:last + 1]:
+            self._fid.seek(offset)
+            parts.append(np.frombuffer(self._decompress(self._fid.read(length)),
+                                       dtype=dtype))
+        if not parts:
+            return np.zeros((0,), dtype=dtype)
+        data = np.concatenate(parts)
+        skip = first * self.chunk_size
+        return data[start - skip:stop - skip]
+
+    def read(self, rows=None, start=0, stop=None):
+        """Read a range of samples of some of the IMFs.
+
+        Parameters
+        ----------
+        rows : list
+            Indices of the IMFs to read, where the residue, if stored, is
+            the last one, as in the output of
+            :meth:`pyhht.emd.EMD.decompose`. (Default: all of them)
+
+        start, stop : int
+            Indices of the first and past the last sample to read.
+            (Default: the whole signal)
+
+        Returns
+        -------
+        imfs : numpy.ndarray
+            Array of shape (len(rows), stop - start).
+        """
+        if rows is None:
+            rows = range(len(self._rows))
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        stop = max(stop, start)
+        entries = [self._rows[i] for i in rows]
+        if not entries:
+            return np.zeros((0, stop - start))
+        return np.array([self._read_array(entry, start, stop)
+                         for entry in entries])
+
+    def time(self, start=0, stop=None):
+        """Read a range of the sampling time instants.
+
+        Returns
+        -------
+        t : numpy.ndarray
+            Time instants of the samples ``start`` to ``stop``, or their
+            indices if the time instants were not stored.
+        """
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        if self._index["t"] is None:
+            return np.arange(start, max(stop, start))
+        return self._read_array(self._index["t"], start, max(stop, start))
+
+    def close(self):
+        self._fid.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def save_decomposition(path, decomposer, chunk_size=65536, compression="zlib",
+                       level=None, **kwargs):
+    """Decompose a signal and write the IMFs to an archive as they are
+    extracted.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+
+    decomposer : pyhht.emd.EmpiricalModeDecomposition
+        Decomposer of the signal. Its state holds the finished decomposition
+        afterwards.
+
+    chunk_size, compression, level :
+        See :class:`ArchiveWriter`.
+
+    **kwargs :
+        Passed on to :meth:`pyhht.emd.EMD.iter_imfs`.
+
+    Example
+    -------
+    >>> save_decomposition("decomposition.hht", EMD(x, t), compression="lzma")
+    >>> archive = load_decomposition("decomposition.hht")
+    """
+    with ArchiveWriter(path, chunk_size, compression, level) as writer:
+        for item in decomposer.iter_imfs(**kwargs):
+            writer.write_imf(item[0])
+        if np.any(decomposer.residue):
+            writer.write_residue(decomposer.residue)
+        writer.close(t=decomposer.t, nbits=decomposer.nbits,
+                     params=decomposer.get_params(), ort=decomposer.ort)
+
+
+def load_decomposition(path):
+    """Open an archive written by :func:`save_decomposition`.
+
+    Returns
+    -------
+    archive : DecompositionArchive
+    """
+    return DecompositionArchive(path)
@@ -0,0 +1,195 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Persistent on-disk cache of EMD results."""
+
+import os
+import os.path as op
+import hashlib
+import shutil
+import tempfile
+import numpy as np
+
+_hash = getattr(hashlib, "blake2b", hashlib.sha1)
+
+
+class DecompositionCache(object):
+    """Content-addressed cache of decompositions, stored as ``.npy`` files.
+
+    Every entry is a directory named after a hash of the signal, the time
+    instants and the parameters of the decomposition, and holds the IMFs and
+    the number of sifting iterations per mode. Entries are read back as
+    memory-mapped arrays, and the least recently used ones are evicted when
+    the cache grows beyond ``max_bytes``.
+
+    Parameters
+    ----------
+    directory : str
+        Directory in which the entries are stored. It is created if needed.
+
+    max_bytes : int
+        Maximum total size of the entries, in bytes. (Default: ``None``,
+        meaning that the cache is unbounded)
+
+    mmap_mode : str
+        Mode in which the cached IMFs are memory-mapped, passed on to
+        ``numpy.load``. (Default: ``'r'``)
+
+    Example
+    -------
+    >>> cache = DecompositionCache("/tmp/emd_cache", max_bytes=2 ** 30)
+    >>> imfs = EMD(x, cache=cache).decompose()  # computed
+    >>> imfs = EMD(x, cache=cache).decompose()  # read from disk
+    >>> cache.stats()
+    {'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1, 'bytes': 80256}
+    """
+
+    def __init__(self, directory, max_bytes=None, mmap_mode="r"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not op.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(x, t, params):
+        """Compute the cache key of a decomposition.
+
+        Parameters
+        ----------
+        x : array-like
+            Decomposed signal.
+
+        t : array-like
+            Sampling time instants.
+
+        params : dict
+            Parameters of the decomposition. Array values are hashed by
+            content.
+
+        Returns
+        -------
+        key : str
+            Hexadecimal digest identifying the decomposition.
+        """
+        h = _hash()
+        for arr in (x, t):
+            arr = np.ascontiguousarray(arr)
+            h.update(str((arr.dtype.str, arr.shape)).encode("utf-8"))
+            h.update(arr.data)
+        for name in sorted(params):
+            value = params[name]
+            h.update(name.encode("utf-8"))
+            if isinstance(value, np.ndarray):
+                h.update(np.ascontiguousarray(value).data)
+            else:
+                h.update(repr(value).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return op.join(self.directory, key)
+
+    def get(self, key):
+        """Look up an entry.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry, as returned by :meth:`key`.
+
+        Returns
+        -------
+        entry : tuple or None
+            ``(imfs, nbits)`` if the entry exists, where ``imfs`` is
+            memory-mapped, ``None`` otherwise.
+        """
+        path = self._path(key)
+        try:
+            imfs = np.load(op.join(path, "imfs.npy"), mmap_mode=self.mmap_mode)
+            nbits = np.load(op.join(path, "nbits.npy"))
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        # The modification time of an entry records its last use.
+        os.utime(path, None)
+        self.hits += 1
+        return imfs, nbits
+
+    def put(self, key, imfs, nbits):
+        """Store an entry, evicting the least recently used ones if the cache
+        is full.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry, as returned by :meth:`key`.
+
+        imfs : array-like
+            IMFs of the decomposition.
+
+        nbits : array-like
+            Number of sifting iterations of each mode.
+        """
+        path = self._path(key)
+        if op.isdir(path):
+            return
+        tmpdir = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            np.save(op.join(tmpdir, "imfs.npy"), np.asarray(imfs))
+            np.save(op.join(tmpdir, "nbits.npy"), np.asarray(nbits))
+            os.rename(tmpdir, path)
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.startswith(".") or not op.isdir(path):
+                continue
+            size = sum(op.getsize(op.join(path, f)) for f in os.listdir(path))
+            entries.append((op.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in
+        ``max_bytes``."""
+        if self.max_bytes is None:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all the entries."""
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        """Usage statistics of the cache.
+
+        Returns
+        -------
+        stats : dict
+            Number of hits, misses and evictions since the cache was opened,
+            along with the number of entries and their total size in bytes.
+        """
+        entries = self._entries()
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries)}
@@ -0,0 +1,209 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Command line batch decomposition of signals stored in files.
+
+Example
+-------
+    $ pyhht "recordings/*.wav" data/run1.npy -o imfs -j 8 --maxiter 500
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import os.path as op
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from timeit import default_timer
+import numpy as np
+from scipy.io import wavfile
+from pyhht.emd import EMD
+from pyhht.archive import save_decomposition
+
+
+def load_signal(path, channel=0):
+    """Read a signal and its time instants from a file.
+
+    Parameters
+    ----------
+    path : str
+        A ``.npy`` file holding the signal, a ``.csv`` file holding the
+        signal in one column, or the time instants and the signal in two
+        columns, or a ``.wav`` file.
+
+    channel : int
+        Channel of multichannel ``.wav`` files to read. (Default: 0)
+
+    Returns
+    -------
+    x, t : tuple
+        The signal and its time instants, or ``None`` if they are not given
+        by the file.
+    """
+    ext = op.splitext(path)[1].lower()
+    t = None
+    if ext == ".npy":
+        x = np.load(path)
+    elif ext == ".csv":
+        data = np.loadtxt(path, delimiter=",", ndmin=2)
+        if data.shape[1] > 1:
+            t, x = data[:, 0], data[:, 1]
+        else:
+            x = data[:, 0]
+    elif ext == ".wav":
+        rate, x = wavfile.read(path)
+        if x.ndim > 1:
+            x = x[:, channel]
+        x = x.astype(float)
+        t = np.arange(x.shape[0]) / float(rate)
+    else:
+        raise ValueError("Unsupported file type: {0}".format(path))
+    return x, t
+
+
+def _target(path, output, fmt):
+    """Path of the file holding the IMFs of an input file."""
+    name = op.splitext(op.basename(path))[0] + ".imfs." + fmt
+    return op.join(output, name)
+
+
+def _decompose_file(path, target, fmt, params, channel, time_budget):
+    """Decompose the signal of a file and save the IMFs."""
+    start = default_timer()
+    x, t = load_signal(path, channel)
+    decomposer = EMD(x, t, **params)
+    if fmt == "hht":
+        save_decomposition(target, decomposer, time_budget=time_budget)
+    else:
+        imfs = decomposer.decompose(time_budget=time_budget)
+        if imfs is None:
+            imfs = np.array(decomposer.imf + [decomposer.residue])
+        np.save(target, imfs)
+    return target, x.shape[0], len(decomposer.nbits), default_timer() - start
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="pyhht",
+        description="Empirical mode decomposition of signals stored in "
+                    ".npy, .csv or .wav files.")
+    parser.add_argument("inputs", nargs="+",
+                        help="input files, or glob patterns of input files")
+    parser.add_argument("-o", "--output", default=".",
+                        help="directory in which the IMFs are saved, as "
+                             "<name>.imfs.npy or <name>.imfs.hht "
+                             "(default: current directory)")
+    parser.add_argument("-f", "--format", choices=("npy", "hht"),
+                        default="npy",
+                        help="format of the saved IMFs: one .npy array per "
+                             "input, or a chunked archive (default: npy)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes "
+                             "(default: number of CPUs)")
+    parser.add_argument("--channel", type=int, default=0,
+                        help="channel of multichannel .wav files (default: 0)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="time allowed for each decomposition, in seconds")
+    group = parser.add_argument_group("decomposition parameters")
+    group.add_argument("--threshold-1", type=float, default=0.05)
+    group.add_argument("--threshold-2", type=float, default=0.5)
+    group.add_argument("--alpha", type=float, default=0.05)
+    group.add_argument("--ndirs", type=int, default=4)
+    group.add_argument("--fixe", type=int, default=0)
+    group.add_argument("--maxiter", type=int, default=2000)
+    group.add_argument("--fixe-h", type=int, default=0)
+    group.add_argument("--n-imfs", type=int, default=0)
+    group.add_argument("--nbsym", type=int, default=2)
+    group.add_argument("--boundary", default="mirror",
+                       choices=("mirror", "periodic", "antisymmetric",
+                                "linear", "endpoints"))
+    group.add_argument("--adaptive", action="store_true")
+    group.add_argument("--cache", default=None,
+                       help="directory of an on-disk cache of results")
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the ``pyhht`` command.
+
+    Parameters
+    ----------
+    argv : list
+        Command line arguments. (Default: ``sys.argv[1:]``)
+
+    Returns
+    -------
+    status : int
+        0 if all the inputs were decomposed, 1 otherwise.
+    """
+    args = _parser().parse_args(argv)
+    paths = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            print("pyhht: no input matches {0}".format(pattern),
+                  file=sys.stderr)
+        paths.extend(matches)
+    targets = [_target(path, args.output, args.format) for path in paths]
+    inputs = set(op.realpath(path) for path in paths)
+    sources = {}
+    for path, target in zip(paths, targets):
+        key = op.realpath(target)
+        if key in inputs:
+            print("pyhht: {0} would overwrite the input {1}".format(
+                path, target), file=sys.stderr)
+            return 1
+        if key in sources:
+            print("pyhht: {0} and {1} would both be saved to {2}".format(
+                sources[key], path, target), file=sys.stderr)
+            return 1
+        sources[key] = path
+    if not op.isdir(args.output):
+        os.makedirs(args.output)
+    params = {"threshold_1": args.threshold_1,
+              "threshold_2": args.threshold_2, "alpha": args.alpha,
+              "ndirs": args.ndirs, "fixe": args.fixe, "maxiter": args.maxiter,
+              "fixe_h": args.fixe_h, "n_imfs": args.n_imfs,
+              "nbsym": args.nbsym, "boundary": args.boundary,
+              "adaptive": args.adaptive, "cache": args.cache}
+
+    start = default_timer()
+    n_files = n_samples = n_failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = dict((pool.submit(_decompose_file, path, target,
+                                    args.format, params, args.channel,
+                                    args.time_budget), path)
+                       for path, target in zip(paths, targets))
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                target, size, n_imfs, elapsed = future.result()
+            except Exception as err:
+                n_failed += 1
+                print("pyhht: {0}: {1}".format(path, err), file=sys.stderr)
+                continue
+            n_files += 1
+            n_samples += size
+            print("{0} -> {1} ({2} IMFs, {3} samples, {4:.2f} s)".format(
+                path, target, n_imfs, size, elapsed))
+            sys.stdout.flush()
+    elapsed = default_timer() - start
+
+    print("{0} files, {1} samples in {2:.2f} s: {3:.1f} samples/s, "
+          "{4:.2f} files/s".format(n_files, n_samples, elapsed,
+                                   n_samples / elapsed if elapsed else 0.0,
+                                   n_files / elapsed if elapsed else 0.0))
+    if n_failed:
+        print("{0} files failed".format(n_failed), file=sys.stderr)
+    return int(bool(n_failed or not paths))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Compact knot-based representation of IMFs."""
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+from pyhht.utils import extr
+
+
+class CompactIMF(object):
+    """An IMF stored as a piecewise cubic polynomial through its extrema and
+    zero crossings.
+
+    Between consecutive extrema and zero crossings an IMF is monotonic and
+    smooth, so a cubic Hermite polynomial through the samples at these knots
+    (and, optionally, a few evenly spaced ones in between) describes it
+    closely. Only the indices of the knots, the values of the IMF and its
+    slopes there are kept, and any range of samples can be reconstructed
+    without evaluating the rest of the IMF. The representation is lossy;
+    the largest error over the IMF is stored in ``error``.
+
+    The knots are at least a quarter of a period apart, so the
+    representation is smaller than the dense IMF for modes slower than
+    about ``10 * (subdivisions + 1)`` samples per period.
+
+    Parameters
+    ----------
+    indices : numpy.ndarray
+        Increasing sample indices of the knots, starting at 0 and ending at
+        ``n_samples - 1``.
+
+    values, slopes : numpy.ndarray
+        Values of the IMF and of its derivative, with respect to time, at
+        the knots.
+
+    n_samples : int
+        Length of the IMF.
+
+    t0, dt : float
+        First time instant and sampling interval, if the IMF is sampled
+        uniformly.
+
+    t : numpy.ndarray
+        Time instants of all the samples, if not. (Default: ``None``)
+
+    error : float
+        Largest absolute reconstruction error. (Default: ``nan``)
+
+    Example
+    -------
+    >>> imfs = EMD(x, t).decompose()
+    >>> compact = CompactIMF.from_imf(imfs[-2], t)
+    >>> compact.nbytes, imfs[-2].nbytes
+    (820, 80000)
+    >>> segment = compact[2000:3000]
+    """
+
+    __slots__ = ("indices", "values", "slopes", "n_samples", "t0", "dt", "t",
+                 "error")
+
+    def __init__(self, indices, values, slopes, n_samples, t0=0.0, dt=1.0,
+                 t=None, error=np.nan):
+        self.indices = indices
+        self.values = values
+        self.slopes = slopes
+        self.n_samples = n_samples
+        self.t0 = t0
+        self.dt = dt
+        self.t = t
+        self.error = error
+
+    @classmethod
+    def from_imf(cls, imf, t=None, subdivisions=1):
+        """Compress an IMF.
+
+        Parameters
+        ----------
+        imf : array-like
+            A real IMF.
+
+        t : array-like
+            Sampling time instants. (Default: ``None``)
+
+        subdivisions : int
+            Number of evenly spaced knots added between consecutive extrema
+            and zero crossings. More knots give a more accurate but larger
+            representation. (Default: 1)
+
+        Returns
+        -------
+        compact : CompactIMF
+        """
+        imf = np.asarray(imf, dtype=float)
+        n = imf.shape[0]
+        t0, dt = 0.0, 1.0
+        if t is not None:
+            t = np.asarray(t, dtype=float)
+            steps = np.diff(t)
+            if n > 1 and np.allclose(steps, steps[0]):
+                t0, dt, t = t[0], steps[0], None
+            else:
+                t0 = t[0]
+        indmin, indmax, indzer = extr(imf)
+        indices = np.unique(np.hstack(([0, n - 1], indmin, indmax, indzer)))
+        if subdivisions > 0 and indices.shape[0] > 1:
+            steps = np.arange(1, subdivisions + 1) / float(subdivisions + 1)
+            extra = indices[:-1, np.newaxis] + \
+                np.outer(np.diff(indices), steps)
+            indices = np.unique(np.hstack((indices,
+                                           np.round(extra).astype(int).ravel())))
+        if n <= np.iinfo(np.int32).max:
+            indices = indices.astype(np.int32)
+        tk = t[indices] if t is not None else t0 + dt * indices
+        if indices.shape[0] > 2:
+            slopes = CubicSpline(tk, imf[indices])(tk, 1)
+        elif indices.shape[0] == 2:
+            slopes = np.repeat(np.diff(imf[indices]) / np.diff(tk), 2)
+        else:
+            slopes = np.zeros((indices.shape[0],))
+        compact = cls(indices, imf[indices], slopes, n, t0, dt, t)
+        compact.error = np.max(np.abs(compact.reconstruct() - imf))
+        return compact
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("CompactIMF only supports contiguous slices.")
+        start, stop, _ = key.indices(self.n_samples)
+        return self.reconstruct(start, stop)
+
+    @property
+    def nbytes(self):
+        """Size of the arrays of the representation, in bytes."""
+        size = self.indices.nbytes + self.values.nbytes + self.slopes.nbytes
+        if self.t is not None:
+            size += self.t.nbytes
+        return size
+
+    def _times(self, indices):
+        if self.t is not None:
+            return self.t[indices]
+        return self.t0 + self.dt * indices
+
+    def reconstruct(self, start=0, stop=None):
+        """Evaluate the IMF over a range of samples.
+
+        Parameters
+        ----------
+        start, stop : int
+            Indices of the first and past the last sample of the range.
+            (Default: the whole IMF)
+
+        Returns
+        -------
+        imf : numpy.ndarray
+            Array of length ``stop - start``.
+        """
+        if stop is None:
+            stop = self.n_samples
+        samples = np.arange(start, stop)
+        if self.indices.shape[0] < 2:
+            return np.full(samples.shape, self.values[0])
+        seg = np.clip(np.searchsorted(self.indices, samples, side="right") - 1,
+                      0, self.indices.shape[0] - 2)
+        tk = self._times(self.indices[seg])
+        h = self._times(self.indices[seg + 1]) - tk
+        tau = (self._times(samples) - tk) / h
+        tau2 = tau * tau
+        tau3 = tau2 * tau
+        return (2 * tau3 - 3 * tau2 + 1) * self.values[seg] + \
+            (tau3 - 2 * tau2 + tau) * h * self.slopes[seg] + \
+            (-2 * tau3 + 3 * tau2) * self.values[seg + 1] + \
+            (tau3 - tau2) * h * self.slopes[seg + 1]
+
+
+def compress_imfs(imfs, t=None, subdivisions=1):
+    """Compress the IMFs of a decomposition.
+
+    Parameters
+    ----------
+    imfs : array-like
+        Array of shape [n_imfs + 1, length(x)], as returned by
+        :meth:`pyhht.emd.EMD.decompose`.
+
+    t : array-like
+        Sampling time instants. (Default: ``None``)
+
+    subdivisions : int
+        See :meth:`CompactIMF.from_imf`.
+
+    Returns
+    -------
+    compact : list
+        A :class:`CompactIMF` per row of ``imfs``.
+    """
+    return [CompactIMF.from_imf(imf, t, subdivisions) for imf in imfs]
@@ -8,11 +8,136 @@
 
 """Empirical Mode Decomposition."""
 
+import os
+import os.path as op
+import shutil
+import tempfile
 import numpy as np
 from numpy import pi
 import warnings
+from timeit import default_timer
+from concurrent.futures import ThreadPoolExecutor
 from scipy.interpolate import splrep, splev
-from pyhht.utils import extr, boundary_conditions
+from scipy.signal import decimate
+from pyhht.utils import extr, boundary_conditions, batch_extr, \
+    SplineCache, gzc_freq
+from pyhht.cache import DecompositionCache
+
+
+class Decomposition(object):
+    """State and result of a single run of the empirical mode decomposition.
+
+    Instances are created by :meth:`EmpiricalModeDecomposition.run`, which
+    updates them as the modes are sifted, so that the decomposer itself only
+    holds configuration and can be shared between threads.
+
+    Attributes
+    ----------
+    x, t : numpy.ndarray
+        Decomposed signal and its sampling time instants.
+
+    is_mode_complex : bool
+        Whether the signal is decomposed as a complex signal.
+
+    residue : numpy.ndarray
+        What remains of the signal after subtracting the IMFs found so far.
+
+    imf : list
+        IMFs found so far.
+
+    nbits : list
+        Number of sifting iterations of each IMF.
+
+    nbit : int
+        Number of sifting iterations of the current (or last) mode.
+
+    NbIt : int
+        Total number of sifting iterations.
+
+    k : int
+        Index of the current mode, starting at 1.
+
+    ort : float
+        Index of orthogonality of the IMFs found so far.
+
+    nbits_saved : list
+        Iterations saved on each mode by warm-starting from a previous
+        decomposer, if any.
+
+    converged : list
+        Whether the sifting of each IMF met the stopping criterion, rather
+        than being cut short by ``maxiter`` or by the time budget.
+
+    splines : pyhht.utils.SplineCache
+        Interpolation operators of the envelopes of real modes, reused
+        while the extrema of the mode do not move. ``splines.stats()``
+        reports how often they were reused.
+
+    imfs : numpy.ndarray
+        Array of shape [n_imfs + 1, length(x)] holding the IMFs and the
+        residue, once the run is complete.
+
+    freqs : list
+        Instantaneous frequency of each IMF, estimated with
+        :func:`pyhht.utils.gzc_freq` as the IMF is extracted, if requested.
+    """
+
+    __slots__ = ("x", "t", "is_mode_complex", "residue", "imf", "nbits",
+                 "nbit", "NbIt", "k", "ort", "nbits_saved", "converged",
+                 "splines", "imfs", "freqs")
+
+    def __init__(self, x, t, is_mode_complex):
+        self.x = x
+        self.t = t
+        self.is_mode_complex = is_mode_complex
+        self.residue = x
+        self.imf = []
+        self.nbits = []
+        self.nbit = 0
+        self.NbIt = 0
+        self.k = 1
+        self.ort = None
+        self.nbits_saved = None
+        self.converged = []
+        self.splines = SplineCache(t)
+        self.imfs = None
+        self.freqs = []
+
+
+def _all_chunks(func, x, chunk_size=2 ** 20):
+    """Check that ``func`` holds for all the elements of ``x``, a chunk at a
+    time, so that memory-mapped arrays are not loaded at once."""
+    for start in range(0, x.shape[0], chunk_size):
+        if not np.all(func(x[start:start + chunk_size])):
+            return False
+    return True
+
+
+def _check_signal(x, t=None, lazy_time=False):
+    """Validate a signal and its time instants, and flatten them. If
+    ``lazy_time`` is true, missing time instants are left as ``None``."""
+    if x.ndim > 1:
+        if 1 not in x.shape:
+            raise ValueError("x must have only one row or one column.")
+    if x.shape[0] > 1:
+        x = x.ravel()
+    if not _all_chunks(np.isfinite, x):
+        raise ValueError("All elements of x must be finite.")
+
+    if t is None:
+        if not lazy_time:
+            t = np.arange(np.max(x.shape))
+    else:
+        if t.shape != x.shape:
+            raise ValueError("t must have the same dimensions as x.")
+        if t.ndim > 1:
+            if 1 not in t.shape:
+                raise ValueError("t must have only one column or one row.")
+        if not _all_chunks(np.isreal, t):
+            raise TypeError("t must be a real vector.")
+        if t.shape[0] > 1:
+            t = t.ravel()
+    return x, t
 
 
 class EmpiricalModeDecomposition(object):
@@ -20,9 +145,12 @@ class EmpiricalModeDecomposition(object):
 
     Parameters
     ----------
-        x : array-like
-            A vector on which to perform empirical mode decomposition.
-    
+        x : array-like or str
+            A vector on which to perform empirical mode decomposition, or the
+            path of a ``.npy`` file holding it, which is then memory-mapped.
+            If ``None``, the decomposer only holds the parameters, and signals
+            are decomposed with :meth:`run`. (Default: ``None``)
+
         t : array-like
             Sampling time instants.
         
@@ -62,7 +190,33 @@ class EmpiricalModeDecomposition(object):
         
         nbsym : int
             Number of points to mirror when calculating envelopes.
-        
+
+        boundary : str
+            How extrema are extended beyond the ends of the signal when
+            calculating envelopes: ``'mirror'``, ``'periodic'``,
+            ``'antisymmetric'``, ``'linear'`` or ``'endpoints'``. See
+            :func:`pyhht.utils.boundary_conditions`. (Default: ``'mirror'``)
+
+        adaptive : bool
+            Whether to restrict the envelope fitting of each sifting
+            iteration to the parts of the mode which still fail the local
+            stopping criterion, plus the support of the splines around them.
+            Late iterations then cost in proportion to the unconverged part
+            of the mode rather than to the length of the signal. Only used
+            for real signals with the default stopping criterion.
+            (Default: ``False``)
+
+        mask : array-like
+            Masking signal of the same shape as ``x``. If provided, the first
+            IMF is extracted with the masking signal method [2]: the modes of
+            ``x + mask`` and ``x - mask`` are sifted together and averaged.
+            (Default: ``None``)
+
+        cache : DecompositionCache or str
+            Opt-in on-disk cache of results, or the directory of one. If
+            provided, :meth:`decompose` returns the cached IMFs of an identical
+            earlier decomposition as a memory-mapped array. (Default: ``None``)
+
     Returns 
     -------
         EMD : numpy.ndarray
@@ -79,12 +233,29 @@ class EmpiricalModeDecomposition(object):
         >>> plot_imfs(x, t, imfs)
 
         .. plot:: ../../docs/examples/simple_emd.py
+
+    The state of a decomposition is held in a :class:`Decomposition`, so a
+    single decomposer can process many signals, concurrently:
+
+        >>> decomposer = EMD(threshold_1=0.1, maxiter=500)
+        >>> with ThreadPoolExecutor() as pool:
+        ...     results = list(pool.map(decomposer.run, signals))
+        >>> imfs = [result.imfs for result in results]
+
+    References
+    ----------
+    .. [1] G. Rilling, P. Flandrin and P. Goncalves, "On empirical mode
+       decomposition and its algorithms", IEEE-EURASIP Workshop on Nonlinear
+       Signal and Image Processing, 2003.
+    .. [2] R. Deering and J. F. Kaiser, "The use of a masking signal to improve
+       empirical mode decomposition", ICASSP 2005.
         """
 
 
-    def __init__(self, x, t=None, threshold_1=0.05, threshold_2=0.5, alpha=0.05,
-                 is_mode_complex=None, ndirs=4, fixe=0, maxiter=2000,
-                 fixe_h=0, n_imfs=0, nbsym=2):
+    def __init__(self, x=None, t=None, threshold_1=0.05, threshold_2=0.5,
+                 alpha=0.05, is_mode_complex=None, ndirs=4, fixe=0,
+                 maxiter=2000, fixe_h=0, n_imfs=0, nbsym=2, mask=None,
+                 cache=None, boundary="mirror", adaptive=False):
         """ Empirical Mode Decomposition Class instantiation"""
         self.threshold_1 = threshold_1
         self.threshold_2 = threshold_2
@@ -93,42 +264,13 @@ class EmpiricalModeDecomposition(object):
         self.fixe_h = fixe_h
         self.ndirs = ndirs
         self.complex_version = 2
-        self.nbit = 0
-        self.Nbit = 0
         self.n_imfs = n_imfs
-        self.k = 1
-        # self.mask = mask
         self.nbsym = nbsym
-        self.nbit = 0
-        self.NbIt = 0
-
-        if x.ndim > 1:
-            if 1 not in x.shape:
-                raise ValueError("x must have only one row or one column.")
-        if x.shape[0] > 1:
-            x = x.ravel()
-        if not np.all(np.isfinite(x)):
-            raise ValueError("All elements of x must be finite.")
-        self.x = x
-        self.ner = self.nzr = len(self.x)
-        self.residue = self.x.copy()
-
-        if t is None:
-            self.t = np.arange(np.max(x.shape))
-        else:
-            if t.shape != self.x.shape:
-                raise ValueError("t must have the same dimensions as x.")
-            if t.ndim > 1:
-                if 1 not in t.shape:
-                    raise ValueError("t must have only one column or one row.")
-            if not np.all(np.isreal(t)):
-                raise TypeError("t must be a real vector.")
-            if t.shape[0] > 1:
-                t = t.ravel()
-            self.t = t
-
-        self.sdt = self.threshold_1 * np.ones((len(self.x),))
-        self.sd2t = self.threshold_2 * np.ones((len(self.x),))
+        if boundary not in ("mirror", "periodic", "antisymmetric", "linear",
+                            "endpoints"):
+            raise ValueError("Unknown boundary mode: {0}".format(boundary))
+        self.boundary = boundary
+        self.adaptive = adaptive
 
         if fixe:
             self.maxiter = fixe
@@ -139,23 +281,109 @@ class EmpiricalModeDecomposition(object):
         # FIXME: `is_mode_complex` should be a boolean and self.complex_version
         # should be a string for better readability. Also, the boolean should
         # be redundant in the signature of __init__
+        self._is_mode_complex = is_mode_complex
+
+        if mask is not None:
+            mask = np.asarray(mask)
+            if not np.all(np.isreal(mask)):
+                raise ValueError("Masking is only supported for real signals.")
+            mask = mask.ravel()
+        self.mask = mask
+
+        if isinstance(cache, str):
+            cache = DecompositionCache(cache)
+        self.cache = cache
+
+        self.x = self._t = self._state = None
+        if x is not None:
+            if isinstance(x, str):
+                x = np.load(x, mmap_mode="r")
+            self.x, self._t = _check_signal(x, t, lazy_time=True)
+            if mask is not None:
+                self._run_state(None)
+
+    @property
+    def t(self):
+        """Sampling time instants of ``x``."""
+        if self._t is None and self.x is not None:
+            return np.arange(self.x.shape[0])
+        return self._t
+
+    def _time(self, start, stop):
+        """Time instants of a range of samples of ``x``."""
+        if self._t is None:
+            return np.arange(start, stop)
+        return self._t[start:stop]
+
+    def _new_run(self, x, t):
+        """Create the state of a decomposition of ``x``."""
+        is_mode_complex = self._is_mode_complex
         if is_mode_complex is None:
-            is_mode_complex = not(np.all(np.isreal(self.x) * self.complex_version))
-        self.is_mode_complex = is_mode_complex
+            is_mode_complex = not _all_chunks(np.isreal, x)
+        if self.mask is not None:
+            if self.mask.size != x.size:
+                raise TypeError("Masking signal must have the same dimensions "
+                                "as the input signal x.")
+            if is_mode_complex:
+                raise ValueError("Masking is only supported for real signals.")
+        return Decomposition(x, t, is_mode_complex)
 
-        self.imf = []
-        self.nbits = []
+    def _run_state(self, run):
+        if run is not None:
+            return run
+        if self._state is None:
+            if self.x is None:
+                raise ValueError("No signal was given to the decomposer.")
+            self._state = self._new_run(self.x, self.t)
+        return self._state
+
+    # Per-run state of the last decomposition of ``x``, kept as attributes
+    # of the decomposer for backward compatibility.
+    def _state_property(name):
+        def fget(self):
+            return getattr(self._run_state(None), name)
+
+        def fset(self, value):
+            setattr(self._run_state(None), name, value)
+        return property(fget, fset)
 
-        # FIXME: Masking disabled because it seems to be recursive.
-#        if np.any(mask):
-#            if mask.shape != x.shape:
-#                raise TypeError("Masking signal must have the same dimensions" +
-#                                "as the input signal x.")
-#            if mask.shape[0]>1:
-#                mask = mask.ravel()
-#            imf1 = emd(x+mask, opts)
+    residue = _state_property("residue")
+    imf = _state_property("imf")
+    nbits = _state_property("nbits")
+    nbit = _state_property("nbit")
+    NbIt = _state_property("NbIt")
+    k = _state_property("k")
+    ort = _state_property("ort")
+    nbits_saved = _state_property("nbits_saved")
+    converged = _state_property("converged")
+    splines = _state_property("splines")
+    freqs = _state_property("freqs")
+    del _state_property
 
-    def io(self):
+    @property
+    def is_mode_complex(self):
+        if self.x is not None:
+            return self._run_state(None).is_mode_complex
+        return self._is_mode_complex
+
+    def get_params(self):
+        """Get the parameters of the decomposition.
+
+        Returns
+        -------
+        params : dict
+            Parameters which, along with ``x`` and ``t``, determine the
+            result of :meth:`decompose`.
+        """
+        return {"threshold_1": self.threshold_1,
+                "threshold_2": self.threshold_2, "alpha": self.alpha,
+                "is_mode_complex": self._is_mode_complex, "ndirs": self.ndirs,
+                "fixe": self.fixe, "maxiter": self.maxiter,
+                "fixe_h": self.fixe_h, "n_imfs": self.n_imfs,
+                "nbsym": self.nbsym, "boundary": self.boundary,
+                "mask": self.mask, "adaptive": self.adaptive}
+
+    def io(self, run=None):
         """Compute the index of orthoginality, as defined by:
 
             .. math:: \sum_{i, j=1, i\neq j}^{N} \frac{\|C_{i}\overline{C_{j}}\|}{\|x\|^2}
@@ -176,78 +404,82 @@ class EmpiricalModeDecomposition(object):
         0.0516420404972
         """
 
-        n = len(self.imf)
+        run = self._run_state(run)
+        n = len(run.imf)
         s = 0
         for i in range(n):
             for j in range(n):
                 if i != j:
-                    s += np.abs(np.sum(self.imf[i] * np.conj(self.imf[j])) / np.sum(self.x**2))
+                    s += np.abs(np.sum(run.imf[i] * np.conj(run.imf[j])) /
+                                    np.sum(run.x**2))
         return 0.5 * s
 
-    def stop_EMD(self):
+    def stop_EMD(self, run=None):
         """Check if there are enough extrema (3) to continue sifting."""
-        if self.is_mode_complex:
+        run = self._run_state(run)
+        if run.is_mode_complex:
             ner = []
             for k in range(self.ndirs):
                 phi = k * pi / self.ndirs
-                indmin, indmax, _ = extr(np.real(np.exp(1j * phi) * self.residue))
+                indmin, indmax, _ = extr(np.real(np.exp(1j * phi) * run.residue))
                 ner.append(len(indmin) + len(indmax))
             stop = np.any(ner < 3)
         else:
-            indmin, indmax, _ = extr(self.residue)
+            indmin, indmax, _ = extr(run.residue)
             ner = len(indmin) + len(indmax)
             stop = ner < 3
         return stop
 
-    def mean_and_amplitude(self, m):
+    def mean_and_amplitude(self, m, run=None):
         """ Computes the mean of the envelopes and the mode amplitudes."""
         # FIXME: The spline interpolation may not be identical with the MATLAB
         # implementation. Needs further investigation.
-        if self.is_mode_complex:
-            if self.is_mode_complex == 1:
+        run = self._run_state(run)
+        if run.is_mode_complex:
+            if run.is_mode_complex == 1:
                 nem = []
                 nzm = []
-                envmin = np.zeros((self.ndirs, len(self.t)))
-                envmax = np.zeros((self.ndirs, len(self.t)))
+                envmin = np.zeros((self.ndirs, len(run.t)))
+                envmax = np.zeros((self.ndirs, len(run.t)))
                 for k in range(self.ndirs):
                     phi = k * pi / self.ndirs
                     y = np.real(np.exp(-1j * phi) * m)
                     indmin, indmax, indzer = extr(y)
                     nem.append(len(indmin) + len(indmax))
                     nzm.append(len(indzer))
-                    tmin, tmax, zmin, zmax = boundary_conditions(y, self.t, m,
-                                                                 self.nbsym)
+                    tmin, tmax, zmin, zmax = boundary_conditions(
+                        y, run.t, m, self.nbsym, mode=self.boundary)
 
                     f = splrep(tmin, zmin)
-                    spl = splev(self.t, f)
+                    spl = splev(run.t, f)
                     envmin[k, :] = spl
 
                     f = splrep(tmax, zmax)
-                    spl = splev(self.t, f)
+                    spl = splev(run.t, f)
                     envmax[k, :] = spl
 
                 envmoy = np.mean((envmin + envmax) / 2, axis=0)
                 amp = np.mean(abs(envmax - envmin), axis=0) / 2
 
-            elif self.is_mode_complex == 2:
+            elif run.is_mode_complex == 2:
                 nem = []
                 nzm = []
-                envmin = np.zeros((self.ndirs, len(self.t)))
-                envmax = np.zeros((self.ndirs, len(self.t)))
+                envmin = np.zeros((self.ndirs, len(run.t)))
+                envmax = np.zeros((self.ndirs, len(run.t)))
                 for k in range(self.ndirs):
                     phi = k * pi / self.ndirs
                     y = np.real(np.exp(-1j * phi) * m)
                     indmin, indmax, indzer = extr(y)
                     nem.append(len(indmin) + len(indmax))
                     nzm.append(len(indzer))
-                    tmin, tmax, zmin, zmax = boundary_conditions(y, self.t, m,
-                                                                 self.nbsym)
+                    tmin, tmax, zmin, zmax = boundary_conditions(
+                        y, run.t, m, self.nbsym, mode=self.boundary)
                     f = splrep(tmin, zmin)
-                    spl = splev(self.t, f)
+                    spl = splev(run.t, f)
                     envmin[k, ] = np.exp(1j * phi) * spl
 
                     f = splrep(tmax, zmax)
-                    spl = splev(self.t, f)
+                    spl = splev(run.t, f)
                     envmax[k, ] = np.exp(1j * phi) * spl
 
                 envmoy = np.mean((envmin + envmax), axis=0)
@@ -257,20 +489,18 @@ class EmpiricalModeDecomposition(object):
             indmin, indmax, indzer = extr(m)
             nem = len(indmin) + len(indmax)
             nzm = len(indzer)
-            tmin, tmax, mmin, mmax = boundary_conditions(m, self.t, m, self.nbsym)
-
-            f = splrep(tmin, mmin)
-            envmin = splev(self.t, f)
+            tmin, tmax, mmin, mmax = boundary_conditions(
+                m, run.t, m, self.nbsym, indmin, indmax, mode=self.boundary)
 
-            f = splrep(tmax, mmax)
-            envmax = splev(self.t, f)
+            envmin = run.splines.interp(tmin, mmin)
+            envmax = run.splines.interp(tmax, mmax)
 
             envmoy = (envmin + envmax) / 2
             amp = np.abs(envmax - envmin) / 2.0
 
         return envmoy, nem, nzm, amp
 
-    def stop_sifting(self, m):
+    def stop_sifting(self, m, run=None):
         """Evaluate the stopping criteria for the current mode.
         
         Parameters
@@ -279,12 +509,13 @@ class EmpiricalModeDecomposition(object):
             The current mode
         """
         # FIXME: This method needs a better name.
+        run = self._run_state(run)
         if self.fixe:
             stop_sift, moyenne = self.mean_and_amplitude(), 0
         elif self.fixe_h:
             stop_count = 0
             try:
-                moyenne, nem, nzm = self.mean_and_amplitude(m)[:3]
+                moyenne, nem, nzm = self.mean_and_amplitude(m, run)[:3]
 
                 if np.all(abs(nzm - nem) > 1):
                     stop = 0
@@ -298,7 +529,7 @@ class EmpiricalModeDecomposition(object):
             stop_sift = stop
         else:
             try:
-                envmoy, nem, nzm, amp = self.mean_and_amplitude(m)
+                envmoy, nem, nzm, amp = self.mean_and_amplitude(m, run)
             except TypeError as err:
                 if err.args[0] == "m > k must hold":
                     return 1, np.zeros((len(m)))
@@ -308,46 +539,569 @@ class EmpiricalModeDecomposition(object):
             sx = np.abs(envmoy) / amp
             stop = not(((np.mean(sx > self.threshold_1) > self.alpha) or
                         np.any(sx > self.threshold_2)) and np.all(nem > 2))
-            if not self.is_mode_complex:
+            if not run.is_mode_complex:
                 stop = stop and not(np.abs(nzm - nem) > 1)
             stop_sift = stop
             moyenne = envmoy
         return stop_sift, moyenne
 
-    def keep_decomposing(self):
+    def keep_decomposing(self, run=None):
         """Check whether to continue the sifting operation."""
-        return not(self.stop_EMD()) and \
-            (self.k < self.n_imfs + 1 or self.n_imfs == 0)  # and \
-# not(np.any(self.mask))
+        run = self._run_state(run)
+        return not(self.stop_EMD(run)) and \
+            (run.k < self.n_imfs + 1 or self.n_imfs == 0)
+
+    def stop_sifting_adaptive(self, m, state, run=None):
+        """Evaluate the stopping criteria for the current mode, refitting the
+        envelopes only where the mode has not converged yet.
+
+        The local criterion ``abs(mean) / amplitude`` of the samples outside
+        the unconverged segments is kept from the previous iterations, and
+        the mean is only subtracted within the segments, tapered off over
+        the margins of spline support around them.
+
+        Parameters
+        ----------
+        m : array-like
+            The current mode
+
+        state : dict
+            Bookkeeping of the adaptive sifting of the mode, initially empty.
+
+        Returns
+        -------
+        stop_sift, moyenne : tuple
+        """
+        run = self._run_state(run)
+        n = m.shape[0]
+        indmin, indmax, indzer = extr(m)
+        nem = len(indmin) + len(indmax)
+        nzm = len(indzer)
+        try:
+            tmin, tmax, mmin, mmax = boundary_conditions(
+                m, run.t, m, self.nbsym, indmin, indmax, mode=self.boundary)
+        except ValueError:
+            return 1, np.zeros((n,))
+        if "sx" not in state:
+            state["sx"] = np.zeros((n,))
+            state["segments"] = [(0, n, 0, n)]
+        sx = state["sx"]
+
+        moyenne = np.zeros((n,))
+        for lo, hi, a, b in state["segments"]:
+            try:
+                envmin = self._local_envelope(run.t, tmin, mmin, lo, hi)
+                envmax = self._local_envelope(run.t, tmax, mmax, lo, hi)
+            except (TypeError, ValueError):
+                # Fall back to the envelopes of the whole mode, which only
+                # fail if the mode has too few extrema to be sifted at all.
+                try:
+                    envmin = run.splines.interp(tmin, mmin)[lo:hi]
+                    envmax = run.splines.interp(tmax, mmax)[lo:hi]
+                except (TypeError, ValueError):
+                    return 1, np.zeros((n,))
+            envmoy = (envmin + envmax) / 2
+            sx[lo:hi] = np.abs(envmoy) / (np.abs(envmax - envmin) / 2.0)
+            taper = np.ones((hi - lo,))
+            taper[:a - lo] = np.linspace(0, 1, a - lo, endpoint=False)
+            taper[b - lo:] = np.linspace(1, 0, hi - b + 1)[1:]
+            moyenne[lo:hi] = envmoy * taper
+
+        stop = not(((np.mean(sx > self.threshold_1) > self.alpha) or
+                    np.any(sx > self.threshold_2)) and nem > 2)
+        stop = stop and not(np.abs(nzm - nem) > 1)
+        if not stop:
+            state["segments"] = self._unconverged_segments(m, sx, indmin,
+                                                           indmax)
+        return stop, moyenne
+
+    def _local_envelope(self, t, tk, zk, lo, hi, support=4):
+        """Evaluate the spline through the knots around samples lo to hi,
+        including ``support`` extra knots on each side. Segments near the
+        edges, with fewer knots around them, are widened to the four knots a
+        cubic spline needs at least."""
+        i0 = max(np.searchsorted(tk, t[lo]) - support, 0)
+        i1 = min(np.searchsorted(tk, t[hi - 1], side="right") + support,
+                 tk.shape[0])
+        if i1 - i0 < 4:
+            i0 = max(min(i0, i1 - 4), 0)
+            i1 = min(i0 + 4, tk.shape[0])
+        return splev(t[lo:hi], splrep(tk[i0:i1], zk[i0:i1]))
+
+    def _unconverged_segments(self, m, sx, indmin, indmax, support=4):
+        """Find the segments of the mode which fail the local criterion, or
+        hold a positive minimum or a negative maximum, each extended by
+        ``support`` extrema on both sides. Overlapping segments are merged.
+
+        Returns
+        -------
+        segments : list
+            ``(lo, hi, a, b)`` tuples, where ``a:b`` is the failing part and
+            ``lo:hi`` its extension.
+        """
+        n = m.shape[0]
+        fail = sx > self.threshold_1
+        fail[indmin[m[indmin] > 0]] = True
+        fail[indmax[m[indmax] < 0]] = True
+        edges = np.flatnonzero(np.diff(np.hstack(([0], fail, [0]))
+                                       .astype(int)))
+        if edges.shape[0] == 0:
+            return [(0, n, 0, n)]
+        a, b = edges[::2], edges[1::2]
+        ext = np.sort(np.hstack((indmin, indmax)))
+        i = np.searchsorted(ext, a) - support
+        lo = np.where(i >= 0, ext[np.clip(i, 0, None)], 0)
+        i = np.searchsorted(ext, b, side="right") + support - 1
+        hi = np.where(i < ext.shape[0],
+                      ext[np.clip(i, None, ext.shape[0] - 1)] + 1, n)
+        lo, hi = np.minimum(lo, a), np.maximum(hi, b)
+        # Merge the extended segments which overlap.
+        new = np.ones(lo.shape, dtype=bool)
+        new[1:] = lo[1:] >= np.maximum.accumulate(hi)[:-1]
+        starts = np.flatnonzero(new)
+        lo = lo[starts]
+        hi = np.maximum.reduceat(hi, starts)
+        a = a[starts]
+        b = np.maximum.reduceat(b, starts)
+        return list(zip(lo, hi, a, b))
+
+    def stop_sifting_batch(self, modes, run=None):
+        """Evaluate the stopping criteria for a stack of real modes at once.
+
+        The extrema of all the modes are found in a single vectorized pass,
+        and the stopping criterion is evaluated on the whole stack. Modes
+        which do not have enough extrema to be enveloped are considered to
+        be finished.
 
-    def decompose(self):
+        Parameters
+        ----------
+        modes : array-like, shape (n_modes, len(x))
+            The current modes
+
+        Returns
+        -------
+        stop_sift, moyenne : tuple
+            Boolean array of length ``n_modes``, and the envelope means of the
+            modes.
+        """
+        run = self._run_state(run)
+        indmin, indmax, indzer = batch_extr(modes)
+        nem = np.array([len(i) + len(j) for i, j in zip(indmin, indmax)])
+        nzm = np.array([len(i) for i in indzer])
+        envmoy = np.zeros(modes.shape)
+        amp = np.ones(modes.shape)
+        fitted = np.zeros((modes.shape[0],), dtype=bool)
+        for i in np.flatnonzero(nem >= 3):
+            m = modes[i]
+            try:
+                tmin, tmax, mmin, mmax = boundary_conditions(
+                    m, run.t, m, self.nbsym, indmin[i], indmax[i],
+                    mode=self.boundary)
+                envmin = splev(run.t, splrep(tmin, mmin))
+                envmax = splev(run.t, splrep(tmax, mmax))
+            except (TypeError, ValueError):
+                continue
+            envmoy[i] = (envmin + envmax) / 2
+            amp[i] = np.abs(envmax - envmin) / 2.0
+            fitted[i] = True
+        sx = np.abs(envmoy) / amp
+        keep = ((np.mean(sx > self.threshold_1, axis=1) > self.alpha) |
+                np.any(sx > self.threshold_2, axis=1)) & (nem > 2)
+        stop = ~fitted | (~keep & (np.abs(nzm - nem) <= 1))
+        return stop, envmoy
+
+    def sift_batch(self, modes, run=None):
+        """Sift a stack of real modes simultaneously.
+
+        Each row is sifted until it satisfies the stopping criterion or
+        ``maxiter`` iterations are reached, after which it is left untouched
+        while the others carry on.
+
+        Parameters
+        ----------
+        modes : array-like, shape (n_modes, len(x))
+            Signals to be sifted.
+
+        Returns
+        -------
+        modes, nbits : tuple
+            The sifted modes and the number of sifting iterations each of
+            them required.
+        """
+        modes = np.array(modes, dtype=float)
+        nbits = np.zeros((modes.shape[0],), dtype=int)
+        active = np.arange(modes.shape[0])
+        while active.shape[0] > 0:
+            stop, moyenne = self.stop_sifting_batch(modes[active], run)
+            stop |= nbits[active] >= self.maxiter
+            go = ~stop
+            modes[active[go]] -= moyenne[go]
+            nbits[active[go]] += 1
+            active = active[go]
+        return modes, nbits
+
+    def masked_modes(self, masks, run=None):
+        """Extract the first IMF of the residue with each of several masking
+        signals.
+
+        For every mask, ``residue + mask`` and ``residue - mask`` are sifted,
+        and the resulting modes are averaged [2]. All the masks are processed
+        as a single batch by :meth:`sift_batch`.
+
+        Parameters
+        ----------
+        masks : array-like, shape (n_masks, len(x))
+            Masking signals.
+
+        Returns
+        -------
+        imfs, nbits : tuple
+            Array of shape (n_masks, len(x)) containing the masked IMFs, and
+            the total number of sifting iterations spent on each of them.
+        """
+        run = self._run_state(run)
+        masks = np.atleast_2d(masks)
+        n_masks = masks.shape[0]
+        modes, nbits = self.sift_batch(np.vstack((run.residue + masks,
+                                                 run.residue - masks)), run)
+        imfs = (modes[:n_masks] + modes[n_masks:]) / 2
+        return imfs, nbits[:n_masks] + nbits[n_masks:]
+
+    def mask_sweep(self, frequencies, amplitudes):
+        """Evaluate the first masked IMF over a grid of sinusoidal masks.
+
+        Parameters
+        ----------
+        frequencies : array-like
+            Frequencies of the masking sinusoids, in cycles per unit of ``t``.
+
+        amplitudes : array-like
+            Amplitudes of the masking sinusoids.
+
+        Returns
+        -------
+        imfs : numpy.ndarray
+            Array of shape (len(frequencies), len(amplitudes), len(x)), where
+            ``imfs[i, j]`` is the first IMF obtained with the mask
+            ``amplitudes[j] * sin(2 * pi * frequencies[i] * t)``.
+
+        Example
+        -------
+        >>> t = linspace(0, 1, 1000)
+        >>> x = sin(2 * pi * 20 * t) + sin(2 * pi * 28 * t)
+        >>> imfs = EMD(x, t).mask_sweep([30, 35, 40], [1, 2])
+        >>> imfs.shape
+        (3, 2, 1000)
+        """
+        frequencies = np.atleast_1d(frequencies)
+        amplitudes = np.atleast_1d(amplitudes)
+        run = self._new_run(self._run_state(None).x, self.t)
+        masks = masking_signals(self.t, frequencies, amplitudes)
+        imfs = self.masked_modes(masks, run)[0]
+        return imfs.reshape(frequencies.shape[0], amplitudes.shape[0], -1)
+
+    def decompose(self, warm_start=None, offset=0, time_budget=None,
+                  checkpoint=None, checkpoint_every=None, resume_from=None,
+                  frequencies=False):
         """Decompose the input signal into IMFs.
 
         This function does all the heavy lifting required for sifting, and
-        should ideally be the only public method of this class."""
-        while self.keep_decomposing():
+        should ideally be the only public method of this class. Each call
+        starts a new decomposition of ``x`` with :meth:`run`, whose state is
+        then available as attributes of the decomposer (``imf``, ``nbits``,
+        ``residue``, etc.).
+
+        Parameters
+        ----------
+        warm_start : EmpiricalModeDecomposition, Decomposition or array-like
+            A previous decomposition of an overlapping window of the signal,
+            either as a decomposer on which :meth:`decompose` has been called,
+            as the result of :meth:`run` or as its array of IMFs. The sifting
+            of each mode then starts from the corresponding IMF of the
+            previous result instead of the raw residue, which makes it
+            converge in far fewer iterations when the signal changes slowly.
+            The iterations saved on each mode with respect to the previous
+            decomposition are stored in ``self.nbits_saved``. Warm-started
+            results are not cached. (Default: ``None``)
+
+        offset : int
+            Position of the first sample of ``x`` in the signal decomposed by
+            ``warm_start``. (Default: 0)
+
+        time_budget : float
+            Time allowed for the decomposition, in seconds. Each mode is
+            given a share of the remaining time, according to an estimate of
+            the number of modes left, and its sifting stops when the share is
+            spent. Once the whole budget is spent, the rest of the signal is
+            returned as the residue. Which modes met the stopping criterion
+            is recorded in ``self.converged``. Results obtained under a time
+            budget are not cached. (Default: ``None``)
+
+        checkpoint : str
+            Path of a ``.npz`` file to which the state of the decomposition
+            is saved after every mode. The file is replaced atomically, so
+            it always holds a consistent state. (Default: ``None``)
+
+        checkpoint_every : int
+            Also save the state every ``checkpoint_every`` sifting
+            iterations within a mode. (Default: ``None``)
+
+        resume_from : str
+            Path of a checkpoint of a decomposition of the same signal with
+            the same parameters, from which to continue. The result is
+            identical to that of an uninterrupted decomposition, provided
+            that ``warm_start`` and ``offset`` are the same as well. Nothing
+            is resumed if the file does not exist, so the same path can be
+            given as ``checkpoint`` and ``resume_from`` to jobs which may be
+            restarted. (Default: ``None``)
+
+        frequencies : bool
+            Whether to estimate the instantaneous frequency of every IMF from
+            its extrema and zero crossings, with
+            :func:`pyhht.utils.gzc_freq`, as soon as it is extracted. The
+            estimates are stored in ``self.freqs``, in cycles per unit of
+            ``t``, and are those of the real part of complex IMFs.
+            (Default: ``False``)
+
+        Returns
+        -------
+        imfs : numpy.ndarray
+            Array of shape [n_imfs + 1, length(x)]
+
+        Example
+        -------
+        >>> decomposer = EMD(x)
+        >>> imfs = decomposer.decompose(time_budget=0.2)
+        >>> decomposer.converged
+        [True, True, False]
+        >>> imfs = EMD(x).decompose(checkpoint="emd.npz", checkpoint_every=50,
+        ...                         resume_from="emd.npz")
+        """
+        if self.x is None:
+            raise ValueError("No signal was given to the decomposer.")
+        self._state = self.run(self.x, self.t, warm_start, offset,
+                               time_budget=time_budget, checkpoint=checkpoint,
+                               checkpoint_every=checkpoint_every,
+                               resume_from=resume_from,
+                               frequencies=frequencies)
+        return self._state.imfs
+
+    def run(self, x, t=None, warm_start=None, offset=0, interrupt=None,
+            time_budget=None, checkpoint=None, checkpoint_every=None,
+            resume_from=None, frequencies=False):
+        """Decompose a signal into IMFs, without modifying the decomposer.
+
+        All the state of the decomposition is held in the returned object,
+        so this method can be called concurrently, from several threads, on
+        the same decomposer.
+
+        Parameters
+        ----------
+        x : array-like
+            A vector on which to perform empirical mode decomposition.
+
+        t : array-like
+            Sampling time instants. (Default: ``None``)
+
+        warm_start, offset, time_budget, checkpoint, checkpoint_every, \
+        resume_from, frequencies :
+            See :meth:`decompose`.
+
+        interrupt : callable
+            Function without arguments called between sifting iterations.
+            If it returns ``True``, the decomposition is abandoned, and the
+            ``imfs`` attribute of the result is left as ``None``.
+            (Default: ``None``)
+
+        Returns
+        -------
+        result : Decomposition
+            State of the finished decomposition, holding the IMFs in its
+            ``imfs`` attribute.
+        """
+        if isinstance(x, str):
+            x = np.load(x, mmap_mode="r")
+        x, t = _check_signal(np.asarray(x), t if t is None else np.asarray(t))
+        run = self._new_run(x, t)
+        modes = self._sift(run, warm_start, offset, interrupt, time_budget,
+                           checkpoint, checkpoint_every, resume_from)
+        if frequencies:
+            modes = self._with_frequencies(run, modes)
+        for _ in modes:
+            pass
+        return run
+
+    def iter_imfs(self, warm_start=None, offset=0, time_budget=None,
+                  checkpoint=None, checkpoint_every=None, resume_from=None,
+                  frequencies=False):
+        """Decompose the input signal lazily, yielding the IMFs one by one as
+        soon as they are extracted.
+
+        The decomposition only proceeds as the generator is consumed, so
+        stopping early (or closing the generator) saves the sifting of the
+        remaining modes. As with :meth:`decompose`, the state of the
+        decomposition is available as attributes of the decomposer; the
+        residue is final once the generator is exhausted.
+
+        Parameters
+        ----------
+        warm_start, offset, time_budget, checkpoint, checkpoint_every, \
+        resume_from :
+            See :meth:`decompose`. IMFs restored from a checkpoint are
+            yielded first.
+
+        frequencies : bool
+            Whether to estimate the instantaneous frequency of every IMF, as
+            in :meth:`decompose`, and yield it along with the IMF.
+            (Default: ``False``)
+
+        Yields
+        ------
+        imf, nbit, elapsed : tuple
+            The IMF, the number of sifting iterations it took and the time
+            spent extracting it, in seconds, followed by its instantaneous
+            frequency if ``frequencies`` is ``True``.
 
-            # current mode
-            m = self.residue
+        Example
+        -------
+        >>> decomposer = EMD(x)
+        >>> for imf, nbit, elapsed in decomposer.iter_imfs():
+        ...     if np.std(imf) < 0.01:
+        ...         break
+        """
+        if self.x is None:
+            raise ValueError("No signal was given to the decomposer.")
+        self._state = self._new_run(self.x, self.t)
+        modes = self._sift(self._state, warm_start, offset,
+                           time_budget=time_budget, checkpoint=checkpoint,
+                           checkpoint_every=checkpoint_every,
+                           resume_from=resume_from)
+        if frequencies:
+            modes = self._with_frequencies(self._state, modes)
+        return modes
 
-            # computing mean and stopping criterion
-            stop_sift, moyenne = self.stop_sifting(m)
+    def _with_frequencies(self, run, modes):
+        """Estimate the instantaneous frequency of the IMFs yielded by
+        :meth:`_sift`, from their extrema and zero crossings."""
+        for imf, nbit, elapsed in modes:
+            real = np.real(imf)
+            freq = gzc_freq(extr(real), real.shape[0], run.t)
+            run.freqs.append(freq)
+            yield imf, nbit, elapsed, freq
 
-            # in case current mode is small enough to cause spurious extrema
-            if np.max(np.abs(m)) < (1e-10) * np.max(np.abs(self.x)):
-                if not stop_sift:
-                    warnings.warn("EMD Warning: Amplitude too small, stopping.")
+    def _sift(self, run, warm_start=None, offset=0, interrupt=None,
+              time_budget=None, checkpoint=None, checkpoint_every=None,
+              resume_from=None):
+        """Carry out the decomposition held in ``run``, yielding every IMF
+        along with its iteration count and extraction time."""
+        x, t = run.x, run.t
+        pending = None
+        if resume_from is not None and op.exists(resume_from):
+            pending = self._load_checkpoint(resume_from, run)
+            for imf, nbit in zip(run.imf, run.nbits):
+                yield imf, nbit, 0.0
+        deadline = mode_deadline = None
+        if time_budget is not None:
+            deadline = default_timer() + time_budget
+        seeds = None
+        if warm_start is not None:
+            seeds = self._warm_start_seeds(warm_start, offset, x.shape[0])
+        store = self.cache is not None and seeds is None and deadline is None
+        if self.cache is not None and seeds is None:
+            key = self.cache.key(x, t, self.get_params())
+            cached = None if run.k > 1 else self.cache.get(key)
+            if cached is not None:
+                imfs, nbits = cached
+                run.nbits = nbits.tolist()
+                run.k = len(run.nbits) + 1
+                # The index of orthogonality is that of the IMFs alone, as
+                # in an uncached run.
+                run.imf = list(imfs[:len(run.nbits)])
+                run.ort = self.io(run)
+                if imfs.shape[0] > len(run.nbits):
+                    run.residue = imfs[-1]
+                    run.imf.append(run.residue)
                 else:
-                    print("Force stopping EMD: amplitude too small.")
+                    run.residue = np.zeros_like(x)
+                run.converged = [n < self.maxiter for n in run.nbits]
+                run.imfs = imfs
+                for imf, nbit in zip(imfs, run.nbits):
+                    yield imf, nbit, 0.0
+                return
+
+        if self.mask is not None and run.k == 1 and self.keep_decomposing(run):
+            start = default_timer()
+            modes, nbits = self.sift_batch(np.vstack((run.residue + self.mask,
+                                                      run.residue - self.mask)),
+                                           run)
+            imfs = [(modes[0] + modes[1]) / 2]
+            run.imf.append(imfs[0])
+            run.nbits.append(int(nbits.sum()))
+            run.converged.append(bool(np.all(nbits < self.maxiter)))
+            run.k += 1
+            run.residue = run.residue - imfs[0]
+            run.ort = self.io(run)
+            if checkpoint is not None:
+                self._save_checkpoint(checkpoint, run)
+            yield imfs[0], run.nbits[-1], default_timer() - start
+
+        while self.keep_decomposing(run):
+            if interrupt is not None and interrupt():
                 return
+            start = default_timer()
+            if deadline is not None:
+                if start >= deadline:
+                    break
+                mode_deadline = start + (deadline - start) / \
+                    self._modes_left(run)
+
+            adaptive = self.adaptive and not(run.is_mode_complex or
+                                             self.fixe or self.fixe_h)
+            if pending is not None:
+                # resume the sifting of the mode from the checkpoint
+                m, moyenne, stop_sift, run.nbit, state = pending
+                pending = None
+            else:
+                # current mode
+                m = run.residue
+                if seeds is not None and run.k <= seeds.shape[0]:
+                    m = m - seeds[run.k - 1]
+                run.nbit = 0
+
+                # computing mean and stopping criterion
+                if adaptive:
+                    state = {}
+                    stop_sift, moyenne = self.stop_sifting_adaptive(m, state,
+                                                                    run)
+                else:
+                    state = None
+                    stop_sift, moyenne = self.stop_sifting(m, run)
+
+                # in case current mode is small enough to cause spurious
+                # extrema
+                if np.max(np.abs(run.residue)) < (1e-10) * np.max(np.abs(x)):
+                    if not stop_sift:
+                        warnings.warn("EMD Warning: Amplitude too small, "
+                                      "stopping.")
+                    else:
+                        print("Force stopping EMD: amplitude too small.")
+                    return
 
             # SIFTING LOOP:
-            while not(stop_sift) and (self.nbit < self.maxiter):
+            while not(stop_sift) and (run.nbit < self.maxiter):
 
-                if (not(self.is_mode_complex) and (self.nbit > self.maxiter / 5) and
-                        self.nbit % np.floor(self.maxiter / 10) == 0 and
-                        not(self.fixe) and self.nbit > 100):
-                    print("Mode " + str(self.k) + ", Iteration " + str(self.nbit))
+                if interrupt is not None and interrupt():
+                    return
+                # Every mode is sifted at least once, even when computing
+                # its first mean already used up its share of the budget.
+                if mode_deadline is not None and run.nbit > 0 and \
+                        default_timer() >= mode_deadline:
+                    break
+
+                if (not(run.is_mode_complex) and (run.nbit > self.maxiter / 5) and
+                        run.nbit % np.floor(self.maxiter / 10) == 0 and
+                        not(self.fixe) and run.nbit > 100):
+                    print("Mode " + str(run.k) + ", Iteration " + str(run.nbit))
                     im, iM, _ = extr(m)
                     print(str(np.sum(m[im] > 0)) + " minima > 0; " + str(np.sum(m[im] < 0)) + " maxima < 0.")
 
@@ -359,26 +1113,446 @@ class EmpiricalModeDecomposition(object):
                     stop_sift, moyenne = self.stop_sifting_fixe()
                 elif self.fixe_h:
                     stop_sift, moyenne, stop_count = self.stop_sifting_fixe_h()
+                elif adaptive:
+                    stop_sift, moyenne = self.stop_sifting_adaptive(m, state,
+                                                                    run)
                 else:
-                    stop_sift, moyenne = self.stop_sifting(m)
+                    stop_sift, moyenne = self.stop_sifting(m, run)
 
-                self.nbit += 1
-                self.NbIt += 1
+                run.nbit += 1
+                run.NbIt += 1
+                if checkpoint is not None and checkpoint_every and \
+                        run.nbit % checkpoint_every == 0:
+                    self._save_checkpoint(checkpoint, run,
+                                          (m, moyenne, stop_sift, run.nbit,
+                                           state))
 
-                if (self.nbit == (self.maxiter - 1)) and not(self.fixe) and (self.nbit > 100):
+                if (run.nbit == (self.maxiter - 1)) and not(self.fixe) and (run.nbit > 100):
                     warnings.warn("Emd:warning, Forced stop of sifting - " +
                                   "Maximum iteration limit reached.")
 
-            self.imf.append(m)
+            run.imf.append(m)
+
+            run.nbits.append(run.nbit)
+            run.converged.append(bool(stop_sift))
+            run.k += 1
 
-            self.nbits.append(self.nbit)
-            self.k += 1
+            run.residue = run.residue - m
+            run.ort = self.io(run)
+            if checkpoint is not None:
+                self._save_checkpoint(checkpoint, run)
+            yield m, run.nbit, default_timer() - start
 
-            self.residue = self.residue - m
-            self.ort = self.io()
+        if np.any(run.residue):
+            run.imf.append(run.residue)
+        if store:
+            self.cache.put(key, run.imf, run.nbits)
+        if isinstance(warm_start, (EmpiricalModeDecomposition, Decomposition)):
+            run.nbits_saved = [a - b for a, b in zip(warm_start.nbits,
+                                                     run.nbits)]
+        run.imfs = np.array(run.imf)
+
+    def _save_checkpoint(self, path, run, pending=None):
+        """Save the state of a decomposition, including that of the mode
+        being sifted, if any, as ``(m, moyenne, stop_sift, nbit, state)``."""
+        n = run.x.shape[0]
+        arrays = {"key": np.array(DecompositionCache.key(run.x, run.t,
+                                                         self.get_params())),
+                  "imf": np.array(run.imf).reshape(-1, n),
+                  "nbits": np.array(run.nbits, dtype=int),
+                  "converged": np.array(run.converged, dtype=bool),
+                  "residue": run.residue, "NbIt": run.NbIt,
+                  "ort": np.nan if run.ort is None else run.ort}
+        seen, factorized = run.splines.get_state()
+        arrays["n_seen"] = len(seen)
+        arrays["n_factorized"] = len(factorized)
+        for i, tk in enumerate(seen):
+            arrays["seen_{0}".format(i)] = tk
+        for i, tk in enumerate(factorized):
+            arrays["factorized_{0}".format(i)] = tk
+        if pending is not None:
+            m, moyenne, stop_sift, nbit, state = pending
+            arrays.update(m=m, moyenne=moyenne, stop_sift=bool(stop_sift),
+                          nbit=nbit)
+            if state is not None:
+                arrays["sx"] = state["sx"]
+                arrays["segments"] = np.array(state["segments"],
+                                              dtype=int).reshape(-1, 4)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fid:
+            np.savez(fid, **arrays)
+        getattr(os, "replace", os.rename)(tmp, path)
+
+    def _load_checkpoint(self, path, run):
+        """Restore the state of a decomposition saved by
+        :meth:`_save_checkpoint` into ``run``, and return that of the mode
+        being sifted, if any."""
+        with np.load(path) as data:
+            key = DecompositionCache.key(run.x, run.t, self.get_params())
+            if str(data["key"]) != key:
+                raise ValueError("{0} is a checkpoint of another "
+                                 "decomposition.".format(path))
+            run.imf = list(data["imf"])
+            run.nbits = data["nbits"].tolist()
+            run.converged = data["converged"].tolist()
+            run.residue = data["residue"]
+            run.k = len(run.imf) + 1
+            run.NbIt = int(data["NbIt"])
+            run.ort = None if np.isnan(data["ort"]) else float(data["ort"])
+            run.splines.set_state(
+                [data["seen_{0}".format(i)] for i in range(data["n_seen"])],
+                [data["factorized_{0}".format(i)]
+                 for i in range(data["n_factorized"])])
+            if "m" not in data:
+                return None
+            state = None
+            if "sx" in data:
+                state = {"sx": data["sx"],
+                         "segments": [tuple(row) for row in data["segments"]]}
+            return (data["m"], data["moyenne"], bool(data["stop_sift"]),
+                    int(data["nbit"]), state)
+
+    def _modes_left(self, run):
+        """Estimate the number of modes left to extract from the residue,
+        each mode having about half as many extrema as the previous one."""
+        indmin, indmax, _ = extr(np.real(run.residue))
+        n_modes = max(np.log2(max(len(indmin) + len(indmax), 1)) - 1, 1)
+        if self.n_imfs:
+            n_modes = min(n_modes, self.n_imfs - run.k + 1)
+        return n_modes
+
+    def _spawn(self, x, t, mask=None):
+        """Create a decomposer with the same parameters for another signal."""
+        params = self.get_params()
+        params["mask"] = mask
+        return EmpiricalModeDecomposition(x, t, cache=self.cache, **params)
+
+    def decompose_overview(self, factor, ftype="iir"):
+        """Compute approximate IMFs of a decimated version of the signal.
+
+        The signal is low-pass filtered and downsampled by ``factor`` with
+        :func:`scipy.signal.decimate` (in stages, for large factors), and the
+        result is decomposed. This is much cheaper than :meth:`decompose` and
+        gives a good approximation of the modes whose frequencies are well
+        below the new Nyquist frequency. Selected time ranges can then be
+        decomposed at full resolution with :meth:`refine`.
+
+        Parameters
+        ----------
+        factor : int
+            Downsampling factor.
+
+        ftype : str
+            Type of the anti-aliasing filter, ``'iir'`` or ``'fir'``, as in
+            :func:`scipy.signal.decimate`. (Default: ``'iir'``)
+
+        Returns
+        -------
+        imfs, t : tuple
+            IMFs of the decimated signal, of shape
+            [n_imfs + 1, ceil(length(x) / factor)], and their time instants.
+
+        Example
+        -------
+        >>> decomposer = EMD(x)
+        >>> coarse, tc = decomposer.decompose_overview(100)
+        >>> plot_imfs(x[::100], coarse, tc)
+        >>> fine, tf = decomposer.refine(2000000, 2100000)
+        """
+        stages = []
+        remainder = int(factor)
+        for q in range(10, 1, -1):
+            while remainder % q == 0:
+                stages.append(q)
+                remainder //= q
+        if remainder > 1:
+            stages.append(remainder)
+
+        x, mask = self.x, self.mask
+        for q in stages:
+            x = decimate(x, q, ftype=ftype, zero_phase=True)
+            if mask is not None:
+                mask = decimate(mask, q, ftype=ftype, zero_phase=True)
+        t = self.t[::int(factor)][:x.shape[0]]
+        return self._spawn(x, t, mask).decompose(), t
+
+    def refine(self, start, stop, margin=None):
+        """Decompose a range of samples at full resolution.
+
+        Parameters
+        ----------
+        start, stop : int
+            Indices of the first and past the last sample of the range.
+
+        margin : int
+            Number of extra samples decomposed on each side of the range and
+            then discarded, so that the end effects of the envelopes do not
+            reach it. (Default: ``(stop - start) // 4``)
+
+        Returns
+        -------
+        imfs, t : tuple
+            IMFs of the range, of shape [n_imfs + 1, stop - start], and their
+            time instants.
+        """
+        if margin is None:
+            margin = (stop - start) // 4
+        lo, hi = max(start - margin, 0), min(stop + margin, self.x.shape[0])
+        mask = self.mask
+        if mask is not None:
+            mask = mask[lo:hi]
+        imfs = self._spawn(self.x[lo:hi], self.t[lo:hi], mask).decompose()
+        return imfs[:, start - lo:stop - lo], self.t[start:stop]
+
+    def decompose_segmented(self, block_size, overlap=None, n_jobs=None):
+        """Decompose the signal in overlapping blocks, in parallel.
+
+        The influence of the envelope splines is local, so long signals can
+        be split into overlapping blocks which are decomposed independently,
+        with the same parameters, by a pool of threads. Every block uses
+        :func:`pyhht.utils.boundary_conditions` at its edges. The IMFs of
+        all the blocks are cut down to the smallest number of IMFs found in
+        a block, by adding the extra ones to the residue, and are then
+        blended with trapezoidal weights across the overlaps, so that they
+        still add up to the signal.
+
+        Parameters
+        ----------
+        block_size : int
+            Number of samples per block.
+
+        overlap : int
+            Number of samples shared by consecutive blocks.
+            (Default: ``block_size // 4``)
+
+        n_jobs : int
+            Number of threads. (Default: as many as
+            :class:`concurrent.futures.ThreadPoolExecutor` uses)
+
+        Returns
+        -------
+        imfs : numpy.ndarray
+            Array of shape [n_imfs + 1, length(x)]
+
+        Example
+        -------
+        >>> decomposer = EMD(x)
+        >>> imfs = decomposer.decompose_segmented(100000, 10000, n_jobs=4)
+        """
+        n = self.x.shape[0]
+        if overlap is None:
+            overlap = block_size // 4
+        if block_size >= n:
+            return self._spawn(self.x, self.t, self.mask).decompose()
+        starts = _block_starts(n, block_size, overlap)
+
+        def _block(start):
+            stop = start + block_size
+            mask = self.mask
+            if mask is not None:
+                mask = mask[start:stop]
+            block = self._spawn(self.x[start:stop], self.t[start:stop], mask)
+            imfs = block.decompose()
+            if imfs is None:
+                imfs = np.array(block.imf + [block.residue])
+            return imfs, len(block.nbits)
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            blocks = list(pool.map(_block, starts))
+
+        n_imfs = min(count for _, count in blocks)
+        dtype = np.result_type(self.x.dtype, float)
+        imfs = np.zeros((n_imfs + 1, n), dtype=dtype)
+        for i, (start, (modes, _)) in enumerate(zip(starts, blocks)):
+            weights = _block_weights(starts, i, block_size, overlap)
+            stop = start + block_size
+            imfs[:n_imfs, start:stop] += weights * modes[:n_imfs]
+            imfs[n_imfs, start:stop] += weights * modes[n_imfs:].sum(0)
+        return imfs
+
+    def decompose_out_of_core(self, out, working_set=2 ** 28, overlap=None,
+                              n_jobs=1, tmpdir=None):
+        """Decompose a signal too long to fit in memory, such as a
+        memory-mapped array, block by block.
+
+        The signal is read in overlapping blocks, whose size is chosen so
+        that the decompositions running at any time fit in roughly
+        ``working_set`` bytes. The IMFs of every block are spilled to a
+        temporary directory, and then blended into ``out`` as with
+        :meth:`decompose_segmented`, one block at a time.
+
+        Parameters
+        ----------
+        out : str or array-like
+            Path of the ``.npy`` file to which the IMFs are written, as a
+            memory-mapped array, or an array of shape [n_imfs + 1, length(x)]
+            in which to write them.
+
+        working_set : int
+            Approximate memory budget of the decompositions, in bytes.
+            (Default: 256 MiB)
+
+        overlap : int
+            Number of samples shared by consecutive blocks.
+            (Default: a quarter of the block size)
+
+        n_jobs : int
+            Number of blocks decomposed at the same time, in threads.
+            (Default: 1)
+
+        tmpdir : str
+            Directory in which the IMFs of the blocks are spilled.
+            (Default: the system temporary directory)
+
+        Returns
+        -------
+        imfs : numpy.memmap or array-like
+            ``out``, holding the IMFs.
+
+        Example
+        -------
+        >>> decomposer = EMD("recording.npy")
+        >>> imfs = decomposer.decompose_out_of_core("imfs.npy",
+        ...                                         working_set=2 ** 30)
+        """
+        n = self.x.shape[0]
+        dtype = np.result_type(self.x.dtype, float)
+        block_size = int(working_set //
+                         (_WORKING_COPIES * dtype.itemsize * n_jobs))
+        block_size = min(max(block_size, 16), n)
+        if overlap is None:
+            overlap = max(block_size // 4, 1)
+        starts = _block_starts(n, block_size, overlap)
+        directory = tempfile.mkdtemp(dir=tmpdir, prefix="pyhht-")
+        try:
+            def _block(i):
+                start, stop = starts[i], starts[i] + block_size
+                mask = self.mask
+                if mask is not None:
+                    mask = mask[start:stop]
+                block = self._spawn(np.array(self.x[start:stop]),
+                                    self._time(start, stop), mask)
+                imfs = block.decompose()
+                if imfs is None:
+                    imfs = np.array(block.imf + [block.residue])
+                np.save(op.join(directory, "{0}.npy".format(i)), imfs)
+                return len(block.nbits)
+
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                n_imfs = min(pool.map(_block, range(starts.shape[0])))
+
+            if isinstance(out, str):
+                out = np.lib.format.open_memmap(out, mode="w+", dtype=dtype,
+                                                shape=(n_imfs + 1, n))
+            elif out.shape != (n_imfs + 1, n):
+                raise ValueError("out must have the shape "
+                                 "{0}.".format((n_imfs + 1, n)))
+            done = 0
+            for i, start in enumerate(starts):
+                stop = start + block_size
+                out[:, done:stop] = 0
+                modes = np.load(op.join(directory, "{0}.npy".format(i)),
+                                mmap_mode="r")
+                weights = _block_weights(starts, i, block_size, overlap)
+                out[:n_imfs, start:stop] += weights * modes[:n_imfs]
+                out[n_imfs, start:stop] += weights * modes[n_imfs:].sum(0)
+                done = stop
+                del modes
+            if isinstance(out, np.memmap):
+                out.flush()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return out
+
+    def _warm_start_seeds(self, warm_start, offset, n):
+        """Compute the local means by which the residue is offset when
+        warm-starting the sifting of each mode.
+
+        The sifting of mode ``k`` starts from the residue minus the sum of the
+        previous IMFs of order greater than ``k`` (and the previous residue),
+        which coincides with the previous ``k`` th IMF wherever the signal is
+        unchanged. Samples not covered by the previous decomposition are
+        extended with the nearest covered value.
+        """
+        if isinstance(warm_start, (EmpiricalModeDecomposition,
+                                   Decomposition)):
+            prev = np.asarray(warm_start.imf)
+        else:
+            prev = np.atleast_2d(warm_start)
+        # trends[k] is the sum of the previous IMFs of order > k
+        trends = np.cumsum(prev[::-1], axis=0)[::-1][1:]
+        start, stop = max(offset, 0), min(offset + n, prev.shape[1])
+        if trends.shape[0] == 0 or start >= stop:
+            return None
+        seeds = np.pad(trends[:, start:stop],
+                       ((0, 0), (start - offset, offset + n - stop)), "edge")
+        if self.mask is not None:
+            # The masked first mode is not warm-started.
+            seeds[0] = 0
+        return seeds
+
+
+# Rough number of signal-sized arrays alive during a decomposition: the
+# residue, the current mode, the envelopes, the IMFs and the spline
+# operators of the envelopes.
+_WORKING_COPIES = 64
+
+
+def _block_starts(n, block_size, overlap):
+    """First samples of the overlapping blocks into which a signal of length
+    ``n`` is split."""
+    if not 0 < overlap < block_size:
+        raise ValueError("overlap must lie between 0 and block_size.")
+    n_blocks = int(np.ceil(float(n - overlap) / (block_size - overlap)))
+    return np.round(np.linspace(0, n - block_size, n_blocks)).astype(int)
+
+
+def _block_weights(starts, i, block_size, overlap):
+    """Blending weights of block ``i``, which ramp up and down across the
+    overlaps and add up to one with those of the neighbouring blocks."""
+    ramp = np.minimum(np.arange(block_size) + 0.5,
+                      block_size - np.arange(block_size) - 0.5) / overlap
+
+    def _raw(j):
+        weights = np.minimum(ramp, 1)
+        if j == 0:
+            weights[:block_size // 2] = 1
+        if j == len(starts) - 1:
+            weights[block_size // 2:] = 1
+        return weights
+
+    total = np.zeros((block_size,))
+    for j in np.flatnonzero(np.abs(starts - starts[i]) < block_size):
+        shift = starts[j] - starts[i]
+        lo, hi = max(shift, 0), min(block_size + shift, block_size)
+        total[lo:hi] += _raw(j)[lo - shift:hi - shift]
+    return _raw(i) / total
+
+
+def masking_signals(t, frequencies, amplitudes):
+    """Generate a grid of sinusoidal masking signals.
+
+    Parameters
+    ----------
+    t : array-like
+        Sampling time instants.
+
+    frequencies : array-like
+        Frequencies of the masks, in cycles per unit of ``t``.
+
+    amplitudes : array-like
+        Amplitudes of the masks.
+
+    Returns
+    -------
+    masks : numpy.ndarray
+        Array of shape (len(frequencies) * len(amplitudes), len(t)), ordered
+        with the amplitudes varying fastest.
+    """
+    phase = np.sin(2 * pi * np.outer(np.atleast_1d(frequencies), t))
+    masks = np.atleast_1d(amplitudes)[np.newaxis, :, np.newaxis] * \
+        phase[:, np.newaxis, :]
+    return masks.reshape(-1, len(t))
 
-        if np.any(self.residue):
-            self.imf.append(self.residue)
-        return np.array(self.imf)
 
 EMD = EmpiricalModeDecomposition
@@ -0,0 +1,238 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Holo-Hilbert spectral analysis.
+
+The amplitude envelope of every IMF of a signal is itself decomposed, and
+the instantaneous frequencies of the IMFs (the carriers) and of the IMFs of
+their envelopes (the amplitude modulations) are binned together into a
+three dimensional spectrum over time, carrier frequency and amplitude
+modulation frequency [1].
+
+References
+----------
+.. [1] N. E. Huang et al., "On Holo-Hilbert spectral analysis: a full
+   informational spectral representation for nonlinear and non-stationary
+   data", Phil. Trans. R. Soc. A, 2016.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.signal import hilbert
+from pyhht.emd import EMD
+from pyhht.utils import am_fm_decomposition, inst_freq
+
+
+class HoloHilbertSpectrum(object):
+    """Sparse accumulator of a spectrum over time, carrier frequency and
+    amplitude modulation frequency.
+
+    Only the bins which receive some energy are stored, as flat indices and
+    values. Contributions are appended as they come and summed lazily, when
+    the spectrum is read.
+
+    Parameters
+    ----------
+    shape : tuple
+        Number of bins along time, carrier frequency and amplitude
+        modulation frequency.
+
+    extent : tuple
+        ``(t_min, t_max, fmax, am_fmax)``: time range and highest
+        frequencies of the bins.
+
+    Example
+    -------
+    >>> spectrum = holo_hilbert_spectrum(x, t, n_jobs=4)
+    >>> plt.imshow(spectrum.sum(axis=0).T, origin="lower", aspect="auto")
+    """
+
+    def __init__(self, shape, extent):
+        self.shape = tuple(shape)
+        self.extent = tuple(extent)
+        self._keys = np.zeros((0,), dtype=np.int64)
+        self._values = np.zeros((0,))
+        self._pending = []
+
+    def add(self, times, freqs, am_freqs, values):
+        """Accumulate values into bins.
+
+        Parameters
+        ----------
+        times, freqs, am_freqs : array-like
+            Bin indices along each axis. Contributions with an index out of
+            range are dropped.
+
+        values : array-like
+            Values added to the bins.
+        """
+        times, freqs, am_freqs, values = np.broadcast_arrays(
+            times, freqs, am_freqs, values)
+        keep = np.ones(times.shape, dtype=bool)
+        for index, size in zip((times, freqs, am_freqs), self.shape):
+            keep &= (index >= 0) & (index < size)
+        keys = np.ravel_multi_index((times[keep], freqs[keep], am_freqs[keep]),
+                                    self.shape)
+        self._pending.append((keys.astype(np.int64), values[keep]))
+
+    def _compact(self):
+        if not self._pending:
+            return
+        keys = np.hstack([self._keys] + [k for k, _ in self._pending])
+        values = np.hstack([self._values] + [v for _, v in self._pending])
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        self._values = np.bincount(inverse.ravel(), weights=values,
+                                   minlength=self._keys.shape[0])
+        self._pending = []
+
+    @property
+    def nnz(self):
+        """Number of non-empty bins."""
+        self._compact()
+        return self._keys.shape[0]
+
+    @property
+    def coords(self):
+        """Indices of the non-empty bins, as an array of shape (nnz, 3)."""
+        self._compact()
+        return np.column_stack(np.unravel_index(self._keys, self.shape))
+
+    @property
+    def values(self):
+        """Values of the non-empty bins, in the order of :attr:`coords`."""
+        self._compact()
+        return self._values
+
+    def sum(self, axis):
+        """Sum the spectrum over some of its axes.
+
+        Parameters
+        ----------
+        axis : int or tuple
+            Axes to sum over: 0 for time, 1 for carrier frequency and 2 for
+            amplitude modulation frequency.
+
+        Returns
+        -------
+        marginal : numpy.ndarray
+            Dense array over the remaining axes, e.g. the spectrum over
+            carrier and amplitude modulation frequencies for ``axis=0``.
+        """
+        axes = set(np.atleast_1d(axis) % 3)
+        kept = [i for i in range(3) if i not in axes]
+        shape = tuple(self.shape[i] for i in kept)
+        coords = self.coords
+        if not kept:
+            return self.values.sum()
+        keys = np.ravel_multi_index(tuple(coords[:, i] for i in kept), shape)
+        return np.bincount(keys, weights=self.values,
+                           minlength=int(np.prod(shape))).reshape(shape)
+
+    def toarray(self):
+        """The spectrum as a dense array."""
+        dense = np.zeros((int(np.prod(self.shape)),))
+        self._compact()
+        dense[self._keys] = self._values
+        return dense.reshape(self.shape)
+
+
+def holo_hilbert_spectrum(x, t=None, n_times=256, n_freqs=128, n_am_freqs=64,
+                          fmax=None, am_fmax=None, n_jobs=None, power=False,
+                          **params):
+    """Compute the Holo-Hilbert spectrum of a signal.
+
+    The signal is decomposed, the amplitude envelopes of all its IMFs are
+    extracted at once by :func:`pyhht.utils.am_fm_decomposition`, and the
+    envelopes are decomposed in parallel threads. Every sample of every IMF
+    of an envelope then contributes its amplitude to the bin of its time,
+    of the instantaneous frequency of the carrier and of its own
+    instantaneous frequency. The residues of the envelopes, i.e. the
+    unmodulated part of the amplitudes, are left out.
+
+    Parameters
+    ----------
+    x : array-like
+        A vector on which to perform empirical mode decomposition.
+
+    t : array-like
+        Uniformly spaced sampling time instants. If given, frequencies are
+        in cycles per unit of time, otherwise they are normalized by the
+        sampling frequency. (Default: ``None``)
+
+    n_times, n_freqs, n_am_freqs : int
+        Number of bins along time, carrier frequency and amplitude
+        modulation frequency. (Default: 256, 128 and 64)
+
+    fmax : float
+        Highest carrier frequency. (Default: the Nyquist frequency)
+
+    am_fmax : float
+        Highest amplitude modulation frequency. (Default: ``fmax``)
+
+    n_jobs : int
+        Number of threads decomposing the envelopes. (Default: as many as
+        :class:`concurrent.futures.ThreadPoolExecutor` uses)
+
+    power : bool
+        Whether to accumulate squared amplitudes. (Default: ``False``)
+
+    **params :
+        Parameters of both layers of decompositions, passed on to
+        :class:`pyhht.emd.EmpiricalModeDecomposition`.
+
+    Returns
+    -------
+    spectrum : HoloHilbertSpectrum
+
+    Example
+    -------
+    >>> spectrum = holo_hilbert_spectrum(x, t, fmax=50, am_fmax=5, n_jobs=4)
+    >>> carrier_am = spectrum.sum(axis=0)
+    """
+    x = np.asarray(x)
+    n_samples = x.shape[0]
+    fs = 1.0
+    if t is not None and n_samples > 1:
+        fs = (n_samples - 1) / float(t[-1] - t[0])
+    if fmax is None:
+        fmax = fs / 2.0
+    if am_fmax is None:
+        am_fmax = fmax
+    extent = (0, n_samples - 1) if t is None else (t[0], t[-1])
+    spectrum = HoloHilbertSpectrum((n_times, n_freqs, n_am_freqs),
+                                   extent + (fmax, am_fmax))
+
+    decomposer = EMD(**params)
+
+    def _modes(signal):
+        result = decomposer.run(signal, t)
+        return result.imfs[:len(result.nbits)]
+
+    imfs = _modes(x)
+    if imfs.shape[0] == 0 or n_samples < 3:
+        return spectrum
+    carrier, amplitude = am_fm_decomposition(imfs, t)
+    # Estimates of the instantaneous frequency start at the third sample.
+    freqs = np.atleast_2d(inst_freq(carrier)[0])
+    rows = np.floor(freqs * (fs * n_freqs / fmax)).astype(int)
+    cols = np.arange(2, n_samples) * n_times // n_samples
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        layers = pool.map(_modes, amplitude)
+        for i, modes in enumerate(layers):
+            if modes.shape[0] == 0:
+                continue
+            analytic = hilbert(modes, axis=-1)
+            am_freqs = np.atleast_2d(inst_freq(analytic)[0])
+            am_rows = np.floor(am_freqs * (fs * n_am_freqs /
+                                           am_fmax)).astype(int)
+            values = np.abs(analytic[:, 2:])
+            if power:
+                values = values ** 2
+            spectrum.add(cols, rows[i], am_rows, values)
+    return spectrum
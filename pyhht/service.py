@@ -0,0 +1,201 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""Asyncio front end to the empirical mode decomposition (Python 3 only)."""
+
+import os
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import RawArray
+from pyhht.emd import EMD
+
+# Cancellation flags of the requests, shared with the worker processes and
+# indexed by the slot of each request.
+_cancelled = None
+
+
+def _init_worker(flags):
+    global _cancelled
+    _cancelled = flags
+
+
+def _decompose(slot, x, t, params):
+    """Decompose a signal in a worker process, giving up as soon as the
+    request is cancelled."""
+    return EMD(**params).run(x, t, interrupt=lambda: _cancelled[slot])
+
+
+class ServiceOverloaded(RuntimeError):
+    """Raised when a request is rejected because the queue is full."""
+
+
+class DecompositionService(object):
+    """Run decompositions from asyncio code in a pool of worker processes.
+
+    At most ``max_workers + max_queue`` requests are admitted at any time;
+    any other request is rejected with :class:`ServiceOverloaded` instead of
+    waiting, so that latency stays bounded under load. Requests which are
+    cancelled, or which time out, stop sifting at the next iteration in the
+    worker process.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of worker processes. (Default: the number of CPUs)
+
+    max_queue : int
+        Number of admitted requests which may wait for a worker.
+        (Default: 16)
+
+    timeout : float
+        Default time limit of a request, in seconds. (Default: ``None``,
+        meaning no limit)
+
+    **params :
+        Default parameters of the decompositions, passed on to
+        :class:`pyhht.emd.EmpiricalModeDecomposition`.
+
+    Example
+    -------
+    >>> async with DecompositionService(max_workers=4, timeout=1.0) as service:
+    ...     imfs = await service.decompose(x, maxiter=500)
+    """
+
+    def __init__(self, max_workers=None, max_queue=16, timeout=None,
+                 **params):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        n_slots = max_workers + max_queue
+        self._flags = RawArray("b", n_slots)
+        self._pool = ProcessPoolExecutor(max_workers=max_workers,
+                                         initializer=_init_worker,
+                                         initargs=(self._flags,))
+        self._slots = deque(range(n_slots))
+        self.capacity = n_slots
+        self.timeout = timeout
+        self.params = params
+
+    @property
+    def pending(self):
+        """Number of requests currently admitted."""
+        return self.capacity - len(self._slots)
+
+    async def run(self, x, t=None, timeout=None, **params):
+        """Decompose a signal in the pool.
+
+        Parameters
+        ----------
+        x : array-like
+            A vector on which to perform empirical mode decomposition.
+
+        t : array-like
+            Sampling time instants. (Default: ``None``)
+
+        timeout : float
+            Time limit of the request, in seconds, overriding that of the
+            service. (Default: ``None``)
+
+        **params :
+            Parameters of the decomposition, overriding those of the service.
+
+        Returns
+        -------
+        result : pyhht.emd.Decomposition
+            State of the finished decomposition.
+
+        Raises
+        ------
+        ServiceOverloaded
+            If the service is already handling ``capacity`` requests.
+
+        asyncio.TimeoutError
+            If the request does not complete within the time limit.
+        """
+        try:
+            slot = self._slots.popleft()
+        except IndexError:
+            raise ServiceOverloaded("{0} requests pending, rejecting "
+                                    "the request.".format(self.capacity))
+        self._flags[slot] = 0
+        options = dict(self.params, **params)
+        # The slot is only freed once the worker is done with it, which may
+        # be after the request itself is cancelled.
+        future = self._pool.submit(_decompose, slot, x, t, options)
+        future.add_done_callback(lambda _: self._slots.append(slot))
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._flags[slot] = 1
+            raise
+
+    async def decompose(self, x, t=None, timeout=None, **params):
+        """Decompose a signal in the pool, as :meth:`run`, and return its
+        IMFs.
+
+        Returns
+        -------
+        imfs : numpy.ndarray
+            Array of shape [n_imfs + 1, length(x)]
+        """
+        result = await self.run(x, t, timeout, **params)
+        return result.imfs
+
+    def close(self, wait=True):
+        """Cancel the waiting requests and shut the worker processes down."""
+        for slot in range(self.capacity):
+            self._flags[slot] = 1
+        self._pool.shutdown(wait=wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+_service = None
+
+
+async def adecompose(x, t=None, timeout=None, **params):
+    """Decompose a signal without blocking the event loop.
+
+    The work is done by a :class:`DecompositionService` shared by all the
+    calls, created on first use with the default settings.
+
+    Parameters
+    ----------
+    x : array-like
+        A vector on which to perform empirical mode decomposition.
+
+    t : array-like
+        Sampling time instants. (Default: ``None``)
+
+    timeout : float
+        Time limit of the request, in seconds. (Default: ``None``)
+
+    **params :
+        Parameters of the decomposition, passed on to
+        :class:`pyhht.emd.EmpiricalModeDecomposition`.
+
+    Returns
+    -------
+    imfs : numpy.ndarray
+        Array of shape [n_imfs + 1, length(x)]
+
+    Example
+    -------
+    >>> imfs = await adecompose(x, maxiter=500, timeout=0.2)
+    """
+    global _service
+    if _service is None:
+        _service = DecompositionService()
+    return await _service.decompose(x, t, timeout, **params)
@@ -0,0 +1,30 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Coroutines of the tests of the decomposition service, kept apart so that
+the tests themselves can be imported by Python 2.
+"""
+
+import time
+import asyncio
+from pyhht.service import ServiceOverloaded
+
+
+async def admission_and_timeout(test, service, x):
+    """Send more requests than the service admits, with a timeout."""
+    requests = [asyncio.ensure_future(service.decompose(x, timeout=0.5))
+                for _ in range(3)]
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    test.assertIsInstance(results[0], asyncio.TimeoutError)
+    test.assertIsInstance(results[1], asyncio.TimeoutError)
+    test.assertIsInstance(results[2], ServiceOverloaded)
+    start = time.time()
+    while service.pending and time.time() - start < 10:
+        await asyncio.sleep(0.05)
+    test.assertEqual(service.pending, 0)
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the archives of decompositions.
+"""
+
+import unittest
+import os.path as op
+import shutil
+import tempfile
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht.emd import EMD
+from pyhht.archive import save_decomposition, load_decomposition
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = op.join(self.directory, "decomposition.hht")
+        self.ts = np.linspace(0, 1, 10000)
+        self.signal = np.sin(2 * np.pi * 5 * self.ts) + \
+            np.sin(2 * np.pi * 10 * self.ts) + self.ts
+        self.mask = 0.5 * np.sin(2 * np.pi * 40 * self.ts)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        """Check that a decomposition is read back unchanged."""
+        imfs = EMD(self.signal, t=self.ts).decompose()
+        decomposer = EMD(self.signal, t=self.ts, threshold_1=0.05)
+        compressions = ["zlib", "none"]
+        try:
+            import lzma
+            compressions.append("lzma")
+        except ImportError:
+            pass
+        for compression in compressions:
+            save_decomposition(self.path, decomposer, chunk_size=1000,
+                               compression=compression)
+            with load_decomposition(self.path) as archive:
+                self.assertEqual(archive.n_imfs, len(decomposer.nbits))
+                assert_allclose(archive.read(), imfs)
+                assert_allclose(archive.time(), self.ts)
+                self.assertEqual(archive.nbits, decomposer.nbits)
+                self.assertAlmostEqual(archive.ort, decomposer.ort)
+                self.assertEqual(archive.params["threshold_1"], 0.05)
+
+    def test_random_access(self):
+        """Check that reading a range only decompresses the chunks which
+        overlap it."""
+        decomposer = EMD(self.signal, t=self.ts, mask=self.mask)
+        save_decomposition(self.path, decomposer, chunk_size=1000)
+        imfs = np.array(decomposer.imf)
+        with load_decomposition(self.path) as archive:
+            assert_allclose(archive.params["mask"], self.mask)
+            calls = []
+            decompress = archive._decompress
+            archive._decompress = lambda data: calls.append(1) or \
+                decompress(data)
+            modes = archive.read([0, -1], 2500, 4200)
+            assert_allclose(modes, imfs[[0, -1], 2500:4200])
+            self.assertEqual(len(calls), 2 * 3)
+            assert_allclose(archive.time(2500, 4200), self.ts[2500:4200])
+
+    def test_frequencies(self):
+        """Check that frequencies may be estimated while archiving."""
+        decomposer = EMD(self.signal, t=self.ts)
+        save_decomposition(self.path, decomposer, frequencies=True)
+        self.assertEqual(len(decomposer.freqs), len(decomposer.nbits))
+        with load_decomposition(self.path) as archive:
+            self.assertEqual(archive.n_imfs, len(decomposer.nbits))
+
+
+if __name__ == '__main__':
+    unittest.main()
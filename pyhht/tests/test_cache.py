@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the on-disk cache of decompositions.
+"""
+
+import unittest
+import shutil
+import tempfile
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht.emd import EMD
+from pyhht.cache import DecompositionCache
+
+
+class TestDecompositionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.ts = np.linspace(0, 1, 1000)
+        self.signal = np.sin(2 * np.pi * 5 * self.ts) + \
+            np.sin(2 * np.pi * 10 * self.ts) + self.ts
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit(self):
+        """Check that a repeated decomposition is read from the cache."""
+        cache = DecompositionCache(self.directory)
+        decomposer = EMD(self.signal, t=self.ts, cache=cache)
+        imfs = decomposer.decompose()
+        other = EMD(self.signal, t=self.ts, cache=cache)
+        cached = other.decompose()
+        self.assertIsInstance(cached, np.memmap)
+        assert_allclose(cached, imfs)
+        self.assertEqual(other.nbits, decomposer.nbits)
+        self.assertAlmostEqual(other.ort, decomposer.ort)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_parameters_in_key(self):
+        """Check that different parameters do not share an entry."""
+        cache = DecompositionCache(self.directory)
+        EMD(self.signal, cache=cache).decompose()
+        EMD(self.signal, cache=cache, threshold_1=0.1).decompose()
+        EMD(self.signal, cache=cache, adaptive=True).decompose()
+        self.assertEqual(cache.stats()["entries"], 3)
+        self.assertEqual(cache.hits, 0)
+
+    def test_eviction(self):
+        """Check that the least recently used entries are evicted."""
+        cache = DecompositionCache(self.directory)
+        EMD(self.signal, cache=cache).decompose()
+        cache.max_bytes = int(cache.stats()["bytes"] * 1.5)
+        EMD(self.signal + 1, cache=cache).decompose()
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.stats()["entries"], 1)
+        EMD(self.signal + 1, cache=cache).decompose()
+        self.assertEqual(cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the pyhht command.
+"""
+
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+import numpy as np
+from numpy.testing import assert_allclose
+from scipy.io import wavfile
+from pyhht.emd import EMD
+from pyhht.cli import main, load_signal
+from pyhht.archive import load_decomposition
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.ts = np.linspace(0, 1, 2000)
+        self.signal = np.sin(2 * np.pi * 5 * self.ts) + \
+            np.sin(2 * np.pi * 10 * self.ts) + self.ts
+        np.save(op.join(self.directory, "a.npy"), self.signal)
+        np.savetxt(op.join(self.directory, "b.csv"),
+                   np.c_[self.ts, self.signal], delimiter=",")
+        wavfile.write(op.join(self.directory, "c.wav"), 2000,
+                      (1000 * self.signal).astype(np.int16))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_signal(self):
+        """Check the readers of the input formats."""
+        x, t = load_signal(op.join(self.directory, "b.csv"))
+        assert_allclose(x, self.signal)
+        assert_allclose(t, self.ts)
+        x, t = load_signal(op.join(self.directory, "c.wav"))
+        assert_allclose(t, np.arange(2000) / 2000.0)
+        self.assertRaises(ValueError, load_signal, "signal.txt")
+
+    def test_batch(self):
+        """Check that all the inputs are decomposed."""
+        output = op.join(self.directory, "out")
+        status = main([op.join(self.directory, "*.npy"),
+                       op.join(self.directory, "*.csv"), "-o", output,
+                       "-j", "2", "--maxiter", "500"])
+        self.assertEqual(status, 0)
+        expected = EMD(self.signal, maxiter=500).decompose()
+        assert_allclose(np.load(op.join(output, "a.imfs.npy")), expected)
+        expected = EMD(self.signal, self.ts, maxiter=500).decompose()
+        assert_allclose(np.load(op.join(output, "b.imfs.npy")), expected)
+
+        status = main([op.join(self.directory, "c.wav"), "-o", output,
+                       "-f", "hht"])
+        self.assertEqual(status, 0)
+        with load_decomposition(op.join(output, "c.imfs.hht")) as archive:
+            assert_allclose(archive.read().sum(0),
+                            (1000 * self.signal).astype(np.int16))
+
+    def test_conflicting_outputs(self):
+        """Check that inputs are never overwritten, nor outputs shared."""
+        path = op.join(self.directory, "a.npy")
+        np.save(op.join(self.directory, "a.imfs.npy"), self.signal)
+        status = main([path, op.join(self.directory, "a.imfs.npy"),
+                       "-o", self.directory])
+        self.assertEqual(status, 1)
+        assert_allclose(np.load(op.join(self.directory, "a.imfs.npy")),
+                        self.signal)
+
+        other = op.join(self.directory, "other")
+        os.makedirs(other)
+        np.save(op.join(other, "a.npy"), self.signal)
+        output = op.join(self.directory, "out")
+        status = main([path, op.join(other, "a.npy"), "-o", output])
+        self.assertEqual(status, 1)
+        self.assertFalse(op.exists(output))
+
+
+if __name__ == '__main__':
+    unittest.main()
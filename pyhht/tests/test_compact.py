@@ -0,0 +1,45 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the compact IMF representation.
+"""
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht.compact import CompactIMF, compress_imfs
+
+
+class TestCompactIMF(unittest.TestCase):
+
+    def setUp(self):
+        self.ts = np.linspace(0, 1, 10000)
+        self.imf = (1 + 0.3 * self.ts) * np.sin(2 * np.pi * 10 * self.ts)
+
+    def test_reconstruct(self):
+        """Check the accuracy and the size of the representation."""
+        compact = CompactIMF.from_imf(self.imf, self.ts)
+        self.assertEqual(len(compact), self.imf.shape[0])
+        self.assertLess(compact.nbytes, self.imf.nbytes / 20)
+        assert_allclose(compact.reconstruct(), self.imf, atol=2e-2)
+        self.assertAlmostEqual(compact.error,
+                               np.abs(compact.reconstruct() - self.imf).max())
+
+    def test_time_range(self):
+        """Check that ranges are reconstructed as parts of the whole IMF."""
+        t = np.sort(np.random.RandomState(0).random_sample((5000,)))
+        imf = np.sin(2 * np.pi * 5 * t)
+        for compact in compress_imfs(np.vstack((imf, imf ** 3)), t, 2):
+            whole = compact.reconstruct()
+            assert_allclose(compact[1234:3456], whole[1234:3456])
+            assert_allclose(compact[-10:], whole[-10:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,13 +10,19 @@
 Unittests for the EMD class
 """
 
+import os
+import time
+import shutil
+import tempfile
 import unittest
 import os.path as op
 import numpy as np
 from scipy.signal import argrelmax, argrelmin, resample
 from scipy.io import loadmat
+from concurrent.futures import ThreadPoolExecutor
 from numpy.testing import assert_allclose
 from pyhht.emd import EMD
+from pyhht.utils import extr, boundary_conditions
 
 
 class TestEMD(unittest.TestCase):
@@ -74,10 +80,10 @@ class TestEMD(unittest.TestCase):
                         "gabor.mat")
         signal = loadmat(fpath)['gabor'].ravel()
         signal = resample(signal, signal.shape[0] * 1000)
-        signal += np.random.normal(size=signal.shape)
+        signal += np.random.RandomState(0).normal(size=signal.shape)
         engine = EMD(signal, maxiter=200)
         engine.decompose()
-        self.assertEqual(engine.nbit, 200)
+        self.assertLessEqual(max(engine.nbits), 200)
 
     def test_residue(self):
         """Test the residue of the emd output."""
@@ -89,5 +95,267 @@ class TestEMD(unittest.TestCase):
         n_minima = argrelmin(imfs[n_imfs - 1, :])[0].shape[0]
         self.assertTrue(max(n_maxima, n_minima) <= 2)
 
+    def test_masked_decomposition(self):
+        """Check that masking separates two close tones."""
+        signal = np.sin(2 * np.pi * 20 * self.ts) + \
+            np.sin(2 * np.pi * 34 * self.ts)
+        mask = 1.5 * np.sin(2 * np.pi * 50 * self.ts)
+        decomposer = EMD(signal, t=self.ts, mask=mask)
+        imfs = decomposer.decompose()
+        assert_allclose(imfs.sum(0), signal, atol=1e-10)
+        tone = np.sin(2 * np.pi * 34 * self.ts)
+        self.assertGreater(np.corrcoef(imfs[0], tone)[0, 1], 0.95)
+
+    def test_mask_sweep(self):
+        """Check that a mask sweep matches the individually masked modes."""
+        signal = np.sin(2 * np.pi * 20 * self.ts) + \
+            np.sin(2 * np.pi * 34 * self.ts)
+        decomposer = EMD(signal, t=self.ts)
+        imfs = decomposer.mask_sweep([40, 50], [1, 1.5, 2])
+        self.assertEqual(imfs.shape, (2, 3, self.ts.shape[0]))
+        mask = 1.5 * np.sin(2 * np.pi * 50 * self.ts)
+        single = EMD(signal, t=self.ts, mask=mask).decompose()
+        assert_allclose(imfs[1, 1], single[0])
+
+    def test_warm_start(self):
+        """Check that warm-starting from a decomposition of the same signal
+        reproduces it without any sifting."""
+        signal = np.sum([self.trend, self.mode1, self.mode2], axis=0)
+        previous = EMD(signal, t=self.ts)
+        imfs = previous.decompose()
+        decomposer = EMD(signal, t=self.ts)
+        warm = decomposer.decompose(warm_start=previous)
+        assert_allclose(warm, imfs)
+        self.assertEqual(decomposer.nbits, [0] * len(previous.nbits))
+        self.assertEqual(decomposer.nbits_saved, previous.nbits)
+
+    def test_warm_start_offset(self):
+        """Check that warm-starting on a shifted window saves iterations."""
+        t = np.arange(9000) / 1000.0
+        signal = np.sin(2 * np.pi * (40 * t + 3 * np.sin(2 * np.pi * 0.3 * t)))
+        signal += 0.8 * np.sin(2 * np.pi * 7 * t + np.cos(t))
+        signal += 0.5 * np.sin(2 * np.pi * 1.1 * t)
+        previous = EMD(signal[:8000])
+        previous.decompose()
+        warm = EMD(signal[1000:])
+        imfs = warm.decompose(warm_start=previous, offset=1000)
+        cold = EMD(signal[1000:])
+        cold.decompose()
+        assert_allclose(imfs.sum(0), signal[1000:], atol=1e-10)
+        self.assertLess(warm.nbits[3], cold.nbits[3])
+
+    def test_decompose_overview(self):
+        """Check the IMFs of the decimated signal and their refinement."""
+        fast = np.sin(2 * np.pi * 1000 * self.ts)
+        slow = np.sin(2 * np.pi * 3 * self.ts)
+        signal = fast + slow
+        decomposer = EMD(signal, t=self.ts)
+        imfs, t = decomposer.decompose_overview(20)
+        self.assertEqual(imfs.shape[1], 500)
+        assert_allclose(t, self.ts[::20])
+        self.assertGreater(np.corrcoef(imfs[0], slow[::20])[0, 1], 0.99)
+        fine, tf = decomposer.refine(4000, 6000)
+        self.assertEqual(fine.shape[1], 2000)
+        assert_allclose(tf, self.ts[4000:6000])
+        assert_allclose(fine.sum(0), signal[4000:6000], atol=1e-10)
+
+    def test_boundary_modes(self):
+        """Check that every boundary mode gives a complete decomposition."""
+        signal = np.sum([self.trend, self.mode1, self.mode2], axis=0)
+        for mode in ("periodic", "antisymmetric", "linear", "endpoints"):
+            imfs = EMD(signal, t=self.ts, boundary=mode).decompose()
+            assert_allclose(imfs.sum(0), signal, atol=1e-10)
+            self.assertGreaterEqual(imfs.shape[0], 3)
+        self.assertRaises(ValueError, EMD, signal, boundary="reflect")
+
+    def test_adaptive_sifting(self):
+        """Check that adaptive sifting finds the same leading modes."""
+        t = np.arange(8000) / 1000.0
+        signal = np.sin(2 * np.pi * (40 * t + 3 * np.sin(2 * np.pi * 0.3 * t)))
+        signal += 0.8 * np.sin(2 * np.pi * 7 * t + np.cos(t))
+        signal += 0.5 * np.sin(2 * np.pi * 1.1 * t)
+        imfs = EMD(signal).decompose()
+        adaptive = EMD(signal, adaptive=True).decompose()
+        assert_allclose(adaptive.sum(0), signal, atol=1e-10)
+        for i in range(3):
+            self.assertGreater(np.corrcoef(imfs[i], adaptive[i])[0, 1], 0.99)
+
+    def test_adaptive_edge_segment(self):
+        """Check that segments at the edges of the mode, with too few
+        extrema for a local fit, are still sifted."""
+        signal = np.sin(2 * np.pi * (2 * self.ts + 20 * self.ts ** 2))
+        decomposer = EMD(signal, t=self.ts, adaptive=True)
+        run = decomposer._new_run(signal, self.ts)
+        expected = decomposer.mean_and_amplitude(signal, run)[0]
+        indmin, indmax, _ = extr(signal)
+        tmin, tmax, mmin, mmax = boundary_conditions(
+            signal, self.ts, signal, 2, indmin, indmax)
+        # The first 700 samples hold a single extremum.
+        for tk, zk in ((tmin, mmin), (tmax, mmax)):
+            envelope = decomposer._local_envelope(self.ts, tk, zk, 0, 700,
+                                                  support=1)
+            self.assertEqual(envelope.shape, (700,))
+
+        def _fail(*args, **kwargs):
+            raise TypeError("m > k must hold")
+
+        decomposer._local_envelope = _fail
+        state = {"sx": np.zeros(signal.shape),
+                 "segments": [(0, 700, 0, 700)]}
+        _, mean = decomposer.stop_sifting_adaptive(signal, state, run)
+        self.assertGreater(np.abs(mean[:700]).max(), 0)
+        assert_allclose(mean[:700], expected[:700])
+        assert_allclose(mean[700:], 0)
+
+    def test_decompose_segmented(self):
+        """Check that blending blocks gives a complete decomposition close
+        to the global one."""
+        t = np.arange(20000) / 1000.0
+        signal = np.sin(2 * np.pi * 40 * t) + 0.8 * np.sin(2 * np.pi * 7 * t)
+        imfs = EMD(signal).decompose()
+        decomposer = EMD(signal)
+        segmented = decomposer.decompose_segmented(5000, 1000, n_jobs=2)
+        self.assertEqual(segmented.shape[1], signal.shape[0])
+        assert_allclose(segmented.sum(0), signal, atol=1e-10)
+        for i in range(2):
+            self.assertGreater(np.corrcoef(imfs[i], segmented[i])[0, 1], 0.99)
+
+    def test_decompose_segmented_integer(self):
+        """Check that integer signals, e.g. samples read from a 16 bit WAV
+        file, are decomposed in blocks into floating point IMFs."""
+        t = np.arange(20000) / 1000.0
+        signal = np.sin(2 * np.pi * 40 * t) + 0.8 * np.sin(2 * np.pi * 7 * t)
+        signal = (10000 * signal).astype(np.int16)
+        segmented = EMD(signal).decompose_segmented(5000, 1000)
+        self.assertTrue(np.issubdtype(segmented.dtype, np.floating))
+        assert_allclose(segmented.sum(0), signal, atol=1e-8)
+
+    def test_concurrent_runs(self):
+        """Check that a decomposer can be shared between threads, and that
+        decompose can be called repeatedly."""
+        signals = [self.trend + self.mode1 + self.mode2,
+                   self.mode1 + 0.5 * self.mode2, self.mode2 + self.trend ** 2]
+        decomposer = EMD(threshold_1=0.05)
+        expected = [EMD(x) for x in signals]
+        for engine in expected:
+            engine.decompose()
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(decomposer.run, signals * 2))
+        for result, engine in zip(results, expected * 2):
+            assert_allclose(result.imfs, np.array(engine.imf))
+            self.assertEqual(result.nbits, engine.nbits)
+        engine = EMD(signals[0])
+        first = engine.decompose()
+        assert_allclose(engine.decompose(), first)
+        self.assertEqual(engine.nbit, engine.nbits[-1])
+
+    def test_iter_imfs(self):
+        """Check that the IMFs are yielded as they are extracted, and that
+        stopping early stops the decomposition."""
+        signal = np.sum([self.trend, self.mode1, self.mode2], axis=0)
+        imfs = EMD(signal, t=self.ts).decompose()
+        decomposer = EMD(signal, t=self.ts)
+        modes = decomposer.iter_imfs()
+        for i, (imf, nbit, elapsed) in enumerate(modes):
+            assert_allclose(imf, imfs[i])
+            self.assertEqual(nbit, decomposer.nbits[-1])
+            self.assertGreaterEqual(elapsed, 0)
+            if i == 0:
+                break
+        modes.close()
+        self.assertEqual(len(decomposer.nbits), 1)
+        yielded = [imf for imf, _, _ in decomposer.iter_imfs()]
+        assert_allclose(np.array(yielded + [decomposer.residue]), imfs)
+
+    def test_frequencies(self):
+        """Check that the frequency of every IMF is estimated as it is
+        extracted."""
+        signal = np.sum([self.trend, self.mode1, self.mode2], axis=0)
+        decomposer = EMD(signal, t=self.ts)
+        imfs = decomposer.decompose(frequencies=True)
+        self.assertEqual(len(decomposer.freqs), len(decomposer.nbits))
+        assert_allclose([np.nanmedian(f) for f in decomposer.freqs[:2]],
+                        [10, 5], rtol=3e-2)
+        for i, (imf, _, _, freq) in enumerate(
+                decomposer.iter_imfs(frequencies=True)):
+            assert_allclose(imf, imfs[i])
+            self.assertIs(freq, decomposer.freqs[i])
+
+    def test_time_budget(self):
+        """Check that a time budget bounds the duration of the decomposition
+        without breaking the completeness of the result."""
+        signal = np.random.RandomState(0).normal(size=100000)
+        decomposer = EMD(signal)
+        start = time.time()
+        imfs = decomposer.decompose(time_budget=0.5)
+        self.assertLess(time.time() - start, 1.5)
+        assert_allclose(imfs.sum(0), signal, atol=1e-10)
+        self.assertEqual(len(decomposer.converged), len(decomposer.nbits))
+        self.assertFalse(all(decomposer.converged))
+        self.assertGreater(imfs.shape[0], 2)
+        self.assertTrue(all(nbit > 0 for nbit in decomposer.nbits))
+
+        signal = np.sum([self.trend, self.mode1, self.mode2], axis=0)
+        decomposer = EMD(signal, t=self.ts)
+        assert_allclose(decomposer.decompose(time_budget=60),
+                        EMD(signal, t=self.ts).decompose())
+        self.assertTrue(all(decomposer.converged))
+
+    def test_checkpoint_resume(self):
+        """Check that a decomposition resumed from a checkpoint gives the
+        same result as an uninterrupted one."""
+        t = self.ts[::10]
+        signal = np.sin(2 * np.pi * 20 * t) + np.sin(2 * np.pi * 30 * t) + \
+            0.05 * np.random.RandomState(0).normal(size=t.shape)
+        directory = tempfile.mkdtemp()
+        path = op.join(directory, "checkpoint.npz")
+        try:
+            for adaptive in (False, True):
+                params = dict(threshold_1=0.01, threshold_2=0.1, alpha=0.01,
+                              adaptive=adaptive)
+                imfs = EMD(signal, t, **params).decompose()
+                calls = []
+                result = EMD(**params).run(
+                    signal, t, checkpoint=path, checkpoint_every=5,
+                    interrupt=lambda: calls.append(1) or len(calls) > 150)
+                self.assertIsNone(result.imfs)
+                decomposer = EMD(signal, t, **params)
+                resumed = decomposer.decompose(checkpoint=path,
+                                               checkpoint_every=5,
+                                               resume_from=path)
+                np.testing.assert_array_equal(resumed, imfs)
+                os.remove(path)
+            other = EMD(signal[::-1], t)
+            other.decompose(checkpoint=path)
+            self.assertRaises(ValueError, EMD(signal, t).decompose,
+                              resume_from=path)
+            EMD(signal, t).decompose(checkpoint=path)
+            adaptive = EMD(signal, t, adaptive=True)
+            self.assertRaises(ValueError, adaptive.decompose, resume_from=path)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_decompose_out_of_core(self):
+        """Check the block-wise decomposition of a memory-mapped signal."""
+        t = np.linspace(0, 10, 20000)
+        signal = np.sin(2 * np.pi * 5 * t) + 0.5 * np.sin(2 * np.pi * 0.7 * t)
+        directory = tempfile.mkdtemp()
+        try:
+            path = op.join(directory, "signal.npy")
+            np.save(path, signal)
+            decomposer = EMD(path)
+            self.assertIsInstance(decomposer.x, np.memmap)
+            imfs = decomposer.decompose_out_of_core(
+                op.join(directory, "imfs.npy"), working_set=2 ** 22)
+            self.assertIsInstance(imfs, np.memmap)
+            assert_allclose(imfs.sum(0), signal, atol=1e-10)
+            block_size = 2 ** 22 // (64 * 8)
+            expected = EMD(signal).decompose_segmented(block_size)
+            assert_allclose(imfs, expected)
+            del imfs
+        finally:
+            shutil.rmtree(directory)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the Holo-Hilbert spectral analysis.
+"""
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht.hhsa import HoloHilbertSpectrum, holo_hilbert_spectrum
+
+
+class TestHoloHilbertSpectrum(unittest.TestCase):
+
+    def test_accumulator(self):
+        """Check that repeated bins are summed and out of range ones
+        dropped."""
+        spectrum = HoloHilbertSpectrum((4, 3, 2), (0, 1, 0.5, 0.5))
+        spectrum.add([0, 1, 3], [2, 0, 5], [1, 1, 0], [1.0, 2.0, 4.0])
+        spectrum.add(0, 2, 1, 0.5)
+        self.assertEqual(spectrum.nnz, 2)
+        dense = spectrum.toarray()
+        self.assertEqual(dense[0, 2, 1], 1.5)
+        self.assertEqual(dense[1, 0, 1], 2.0)
+        self.assertEqual(dense.sum(), 3.5)
+        assert_allclose(spectrum.sum(axis=0), dense.sum(0))
+        assert_allclose(spectrum.sum(axis=(1, 2)), dense.sum((1, 2)))
+
+    def test_amplitude_modulation(self):
+        """Check that an AM tone is found at its carrier and modulation
+        frequencies."""
+        t = np.linspace(0, 4, 4000)
+        x = (1 + 0.5 * np.sin(2 * np.pi * 2 * t)) * np.sin(2 * np.pi * 40 * t)
+        spectrum = holo_hilbert_spectrum(x, t, n_times=16, n_freqs=16,
+                                         n_am_freqs=8, fmax=60, am_fmax=10,
+                                         n_jobs=2)
+        self.assertLess(spectrum.nnz, np.prod(spectrum.shape))
+        marginal = spectrum.sum(axis=0)
+        self.assertEqual(np.unravel_index(np.argmax(marginal),
+                                          marginal.shape), (10, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the asyncio decomposition service.
+"""
+
+import sys
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht.emd import EMD
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from pyhht.service import DecompositionService
+    from service_helpers import admission_and_timeout
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "requires Python 3.7")
+class TestDecompositionService(unittest.TestCase):
+
+    def setUp(self):
+        self.ts = np.linspace(0, 1, 10000)
+        self.signal = self.ts + np.sin(2 * np.pi * 5 * self.ts) + \
+            np.sin(2 * np.pi * 10 * self.ts)
+        self.service = DecompositionService(max_workers=1, max_queue=1)
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_decompose(self):
+        """Check that the service gives the same IMFs as EMD."""
+        imfs = asyncio.run(self.service.decompose(self.signal, self.ts,
+                                                  threshold_1=0.1))
+        expected = EMD(self.signal, self.ts, threshold_1=0.1).decompose()
+        assert_allclose(imfs, expected)
+
+    def test_spline_cache_hits(self):
+        """Check that results holding reused spline factorizations are sent
+        back from the workers."""
+        t = np.linspace(0, 1, 8000)
+        x = np.sin(2 * np.pi * 20 * t) + \
+            0.5 * np.random.RandomState(0).normal(size=t.shape)
+        result = asyncio.run(self.service.run(x, t, threshold_1=0.01))
+        self.assertGreater(result.splines.hits, 0)
+        assert_allclose(result.imfs,
+                        EMD(x, t, threshold_1=0.01).decompose())
+
+    def test_admission_and_timeout(self):
+        """Check that requests beyond the capacity are rejected, and that
+        timed out requests stop their worker."""
+        noise = np.random.RandomState(0).normal(size=200000)
+        asyncio.run(admission_and_timeout(self, self.service, noise))
+
+
+if __name__ == '__main__':
+    unittest.main()
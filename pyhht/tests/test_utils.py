@@ -10,9 +10,12 @@
 Tests for the basic utility functions in `pyhht.utils`
 """
 
+import pickle
 import unittest
 from pyhht import utils
 import numpy as np
+from scipy.interpolate import splrep, splev, PchipInterpolator, BSpline
+from scipy.signal import argrelmax
 
 
 class TestUtils(unittest.TestCase):
@@ -28,6 +31,73 @@ class TestUtils(unittest.TestCase):
         self.assertGreaterEqual(np.less_equal(lower, self.sinusoid).sum(),
                                 0.9 * self.sinusoid.shape[0])
 
+    def test_get_envelopes_batch(self):
+        """
+        Test if the envelopes of a batch of signals match those fitted one
+        signal at a time.
+        """
+        t = np.linspace(0, 1, 1000)
+        x = np.vstack((self.sinusoid, np.sin(2 * np.pi * 13 * t) * (1 + t),
+                       self.random_data, t))
+        for kind in ("cubic", "pchip", "linear"):
+            upper, lower = utils.get_envelops(x, t, kind=kind)
+            self.assertEqual(upper.shape, x.shape)
+            for i in range(3):
+                ind = np.hstack(([0], argrelmax(x[i])[0], [999]))
+                if kind == "cubic":
+                    expected = splev(t, splrep(t[ind], x[i, ind]))
+                elif kind == "pchip":
+                    expected = PchipInterpolator(t[ind], x[i, ind])(t)
+                else:
+                    expected = np.interp(t, t[ind], x[i, ind])
+                np.testing.assert_allclose(upper[i], expected, atol=1e-10)
+            np.testing.assert_allclose(upper[3], t)
+            np.testing.assert_allclose(lower[3], t)
+
+    def test_inst_freq(self):
+        """
+        Test if all the instantaneous frequency estimators recover the
+        frequencies of a stack of tones.
+        """
+        k = np.arange(2000)
+        freqs = np.array([0.02, 0.1, 0.2])
+        x = np.cos(2 * np.pi * freqs[:, np.newaxis] * k)
+        for method in ("phase", "teager", "normalized"):
+            for L in (1, 4):
+                fnorm, t = utils.inst_freq(x, L=L, method=method)
+                self.assertEqual(fnorm.shape, (3, t.shape[0]))
+                expected = np.repeat(freqs[:, np.newaxis], t.shape[0], axis=1)
+                np.testing.assert_allclose(fnorm[:, 100:-100],
+                                           expected[:, 100:-100], atol=5e-3)
+
+    def test_inst_freq_time_instants(self):
+        """
+        Test if estimates at given time instants match the full estimate.
+        """
+        z = np.exp(2j * np.pi * 0.1 * np.arange(100) ** 1.2 / 10)
+        fnorm, t = utils.inst_freq(z, L=3)
+        fsub, tsub = utils.inst_freq(z, t=np.array([10, 50]), L=3)
+        np.testing.assert_allclose(fsub, fnorm[t.searchsorted([10, 50])])
+        self.assertRaises(ValueError, utils.inst_freq, z, np.array([1]), 3)
+
+    def test_am_fm_decomposition(self):
+        """
+        Test if the amplitude and the carrier of a stack of amplitude
+        modulated tones are recovered.
+        """
+        k = np.arange(4000)
+        amplitude = 1 + 0.9 * np.sin(2 * np.pi * k / 1500.0)
+        phase = 2 * np.pi * (0.03 * k + 0.01 * k ** 2 / 4000.0)
+        imfs = np.vstack((amplitude * np.cos(phase), np.cos(phase)))
+        carrier, amp = utils.am_fm_decomposition(imfs)
+        np.testing.assert_allclose(carrier * amp, imfs, atol=1e-12)
+        self.assertLessEqual(np.abs(carrier).max(), 1)
+        np.testing.assert_allclose(amp[0, 200:-200], amplitude[200:-200],
+                                   atol=0.05)
+        np.testing.assert_allclose(carrier[:, 200:-200],
+                                   np.cos(phase[200:-200]) * np.ones((2, 1)),
+                                   atol=0.05)
+
     def test_error_not_enough_extrema(self):
         t = np.linspace(0, 1, 1000)
         signal = np.exp(-(t - 500) ** 2)
@@ -48,6 +118,35 @@ class TestUtils(unittest.TestCase):
         np.testing.assert_allclose(a, 2 * np.ones((a.shape[0])))
         np.testing.assert_allclose(b, 2 * np.ones((b.shape[0])))
 
+    def test_boundary_conditions_short_signal(self):
+        """
+        Test if mirroring falls back to the end samples instead of failing
+        when the mirrored extrema do not cover the signal.
+        """
+        x = np.array([1.0, -0.1, 0.03, 0.21, -0.05, -0.9, 0.48, 0.51])
+        t = np.arange(8)
+        tmin, tmax, zmin, zmax = utils.boundary_conditions(x, t, x, 2)
+        self.assertLessEqual(tmin[0], t[0])
+        self.assertLessEqual(tmax[0], t[0])
+        self.assertTrue(np.all(np.diff(tmin) > 0))
+        self.assertTrue(np.all(np.diff(tmax) > 0))
+
+    def test_boundary_modes(self):
+        """
+        Test if every extension mode covers the signal with increasing knots.
+        """
+        t = np.linspace(0, 1, 1000)
+        for mode in ("periodic", "antisymmetric", "linear", "endpoints"):
+            tmin, tmax, zmin, zmax = utils.boundary_conditions(
+                self.sinusoid, t, nbsym=2, mode=mode)
+            for tk in (tmin, tmax):
+                self.assertTrue(np.all(np.diff(tk) > 0))
+                self.assertLessEqual(tk[0], t[0])
+                self.assertGreaterEqual(tk[-1], t[-1])
+            self.assertTrue(np.all(zmax > zmin.mean()))
+        self.assertRaises(ValueError, utils.boundary_conditions,
+                          self.sinusoid, t, mode="reflect")
+
     def test_extrema_sinusoid(self):
         """
         Test if local extrema are detected properly for a trended sinusoid.
@@ -102,5 +201,54 @@ class TestUtils(unittest.TestCase):
         p = np.prod(neighbours, axis=1)
         self.assertTrue(np.all(p < 0))
 
+    def test_batch_extr(self):
+        """
+        Test if the batched extrema match those found row by row.
+        """
+        x = np.vstack((self.sinusoid, self.random_data - 0.5,
+                       self.random_data - 0.5))
+        x[2, 10:14] = 0
+        indmin, indmax, indzer = utils.batch_extr(x)
+        for i in range(x.shape[0]):
+            for a, b in zip(utils.extr(x[i]), (indmin[i], indmax[i], indzer[i])):
+                np.testing.assert_array_equal(a, b)
+
+    @unittest.skipIf(not hasattr(BSpline, "design_matrix"),
+                     "requires scipy >= 1.8")
+    def test_spline_cache(self):
+        """Check that cached spline operators reproduce splrep/splev."""
+        rng = np.random.RandomState(0)
+        t = np.linspace(0, 1, 1000)
+        tk = np.hstack(([-0.05], np.sort(rng.random_sample((40,))), [1.05]))
+        splines = utils.SplineCache(t)
+        for _ in range(3):
+            yk = rng.random_sample(tk.shape)
+            np.testing.assert_allclose(splines.interp(tk, yk),
+                                       splev(t, splrep(tk, yk)), atol=1e-10)
+        self.assertEqual(splines.stats(), {"hits": 1, "misses": 2,
+                                           "hit_rate": 1 / 3.0})
+        restored = pickle.loads(pickle.dumps(splines))
+        np.testing.assert_allclose(restored.interp(tk, yk),
+                                   splines.interp(tk, yk))
+        self.assertEqual(restored.hits, 2)
+
+    def test_gzc_freq(self):
+        """Check the zero-crossing frequency of sinusoids, row by row and in
+        batch."""
+        t = np.linspace(0, 1, 1000)
+        x = np.vstack((self.sinusoid, np.sin(2 * np.pi * 12 * t)))
+        freqs = utils.gzc_freq(utils.batch_extr(x), 1000, t)
+        self.assertEqual(freqs.shape, (2, 1000))
+        np.testing.assert_allclose(np.nanmedian(freqs, axis=1), [5, 12],
+                                   rtol=1e-2)
+        np.testing.assert_allclose(utils.gzc_freq(utils.extr(x[1]), 1000, t),
+                                   freqs[1])
+        rows, starts, stops, freq = utils.gzc_freq(utils.batch_extr(x), 1000,
+                                                   per_sample=False)
+        np.testing.assert_array_equal(np.unique(rows), [0, 1])
+        self.assertTrue(np.all(stops > starts))
+        np.testing.assert_allclose(freqs[rows, starts], freq * 999)
+
+
 if __name__ == '__main__':
     unittest.main()
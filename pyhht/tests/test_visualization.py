@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2015 jaidev <jaidev@newton>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests for the plotting functions in `pyhht.visualization`
+"""
+
+import unittest
+import os.path as op
+import shutil
+import tempfile
+import numpy as np
+from numpy.testing import assert_allclose
+from pyhht import visualization
+
+
+class TestVisualization(unittest.TestCase):
+
+    def setUp(self):
+        self.ts = np.linspace(0, 1, 10000)
+        self.imfs = np.vstack((np.sin(2 * np.pi * 50 * self.ts),
+                               np.sin(2 * np.pi * 5 * self.ts), self.ts))
+
+    def test_minmax_decimate(self):
+        """Check that the decimated signals keep the extrema of each bucket."""
+        t, values = visualization.minmax_decimate(self.ts, self.imfs, 100)
+        self.assertEqual(t.shape, (200,))
+        self.assertEqual(values.shape, (3, 200))
+        buckets = self.imfs.reshape(3, 100, 100)
+        assert_allclose(values[:, ::2], buckets.min(axis=2))
+        assert_allclose(values[:, 1::2], buckets.max(axis=2))
+        assert_allclose(t[::2], self.ts[::100])
+
+    def test_minmax_decimate_short(self):
+        """Check that short signals are not decimated."""
+        t, values = visualization.minmax_decimate(self.ts, self.imfs, 10000)
+        self.assertIs(t, self.ts)
+        assert_allclose(values, self.imfs)
+
+    def test_imfs_figure(self):
+        """Check that a figure is built with one axes per row."""
+        signal = self.imfs.sum(0)
+        fig = visualization.imfs_figure(signal, self.imfs, self.ts)
+        self.assertEqual(len(fig.axes), 4)
+        t, values = fig.axes[1].lines[0].get_data()
+        self.assertLess(t.shape[0], self.ts.shape[0])
+
+    def test_export_imfs(self):
+        """Check that decompositions are exported to image files."""
+        directory = tempfile.mkdtemp()
+        try:
+            signal = self.imfs.sum(0)
+            fnames = [op.join(directory, "emd.png"),
+                      op.join(directory, "emd.svg")]
+            decompositions = [(signal, self.imfs), (signal, self.imfs, self.ts)]
+            done = visualization.export_imfs(decompositions, fnames, n_jobs=2)
+            self.assertEqual(sorted(done), sorted(fnames))
+            for fname in fnames:
+                self.assertTrue(op.getsize(fname) > 0)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_hilbert_spectrum(self):
+        """Check that each IMF is binned at its frequency."""
+        spectrum, extent = visualization.hilbert_spectrum(
+            self.imfs, self.ts, n_times=50, n_freqs=40, fmax=120)
+        self.assertEqual(spectrum.shape, (40, 50))
+        self.assertEqual(extent, (0, 1, 0, 120))
+        profile = spectrum[:, 5:-5].sum(1)
+        self.assertEqual(set(np.argsort(profile)[-2:]), set([1, 16]))
+        # Every sample but the first two of each IMF has unit amplitude.
+        assert_allclose(spectrum.sum(), 2 * (self.ts.shape[0] - 2), rtol=0.05)
+
+    def test_plot_hilbert_spectrum(self):
+        """Check that the spectrum is drawn at the resolution of the axes."""
+        fig = visualization.plot_hilbert_spectrum(self.imfs, self.ts,
+                                                  show=False)
+        image = fig.axes[0].images[0].get_array()
+        bbox = fig.axes[0].get_window_extent()
+        self.assertEqual(image.shape, (int(bbox.height), int(bbox.width)))
+        visualization.plt.close(fig)
+
+
+if __name__ == '__main__':
+    unittest.main()
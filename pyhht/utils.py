@@ -10,13 +10,18 @@
 Utility functions used to inspect EMD functionality.
 """
 
+from collections import OrderedDict
 from matplotlib.mlab import find
 import numpy as np
-from scipy.signal import argrelmax, argrelmin
-from scipy import interpolate, angle
+from numpy.lib.stride_tricks import as_strided
+from scipy.signal import argrelmax, argrelmin, hilbert
+from scipy import linalg
+from scipy.interpolate import BSpline, splrep, splev
+from scipy.sparse.linalg import splu
+from scipy.special import comb
 
 
-def inst_freq(x, t=None, L=1):
+def inst_freq(x, t=None, L=1, method="phase"):
     """
     Compute the instantaneous frequency of an analytic signal at specific
     time instants using the trapezoidal integration rule.
@@ -24,21 +29,45 @@ def inst_freq(x, t=None, L=1):
     Parameters
     ----------
     x : numpy.ndarray
-        The input analytic signal
+        The input analytic signal, or a 2-D array of signals (such as the
+        IMFs returned by :meth:`pyhht.emd.EMD.decompose`), one per row. Real
+        input is turned into an analytic signal with the Hilbert transform
+        by the ``'phase'`` method.
     
     t : numpy.ndarray
         The time instants at which to calculate the instantaneous frequencies.
+        (Default: all the instants at which the estimator is defined)
     
     L : int
-        Non default values are currently not supported.
-        If L is 1, the normalized instantaneous frequency is computed. If L > 1,
-        the maximum likelihood estimate of the instantaneous frequency of the
-        deterministic part of the signal.
+        Half-width of the estimation window. If L is 1, the normalized
+        instantaneous frequency is computed. If L > 1, the ``'phase'`` method
+        computes the maximum likelihood estimate of the instantaneous
+        frequency of the deterministic part of the signal [1], and the other
+        methods average their estimates over ``2 * L - 1`` samples.
+
+    method : str
+        Estimator of the instantaneous frequency:
+
+        * ``'phase'``: phase difference (L = 1) or Kay's weighted phase
+          difference (L > 1) estimators.
+        * ``'teager'``: Teager-Kaiser energy operator, through the DESA-2
+          algorithm [2]. Only the real part of ``x`` is used, and only
+          frequencies below a quarter of the sampling frequency can be
+          estimated.
+        * ``'normalized'``: phase estimator applied to the Hilbert transform
+          of the real part of ``x`` normalized by its envelope, i.e. the
+          normalized Hilbert transform [3].
+
+        (Default: ``'phase'``)
 
     Returns
     -------
     fnorm : numpy.ndarray
-        instantaneous frequencies of the input signal.
+        instantaneous frequencies of the input signal, normalized by the
+        sampling frequency.
+
+    t : numpy.ndarray
+        time instants of the estimates.
 
     Example
     -------
@@ -48,11 +77,25 @@ def inst_freq(x, t=None, L=1):
     >>> plot(timestamps, instf)
 
     .. plot:: docstring_plots/utils/inst_freq.py
+
+    All the estimators have a cost linear in the length of the signal,
+    whatever the value of ``L``.
+
+    References
+    ----------
+    .. [1] S. Kay, "A fast and accurate single frequency estimator", IEEE
+       Trans. Acoust. Speech Signal Process., 1989.
+    .. [2] P. Maragos, J. F. Kaiser and T. F. Quatieri, "Energy separation in
+       signal modulations with application to speech analysis", IEEE Trans.
+       Signal Process., 1993.
+    .. [3] N. E. Huang et al., "On instantaneous frequency", Advances in
+       Adaptive Data Analysis, 2009.
     """
+    x = np.asarray(x)
     if x.ndim != 1:
-        if 1 not in x.shape:
-            raise TypeError("Input should be a one dimensional array.")
-        else:
+        if x.ndim > 2:
+            raise TypeError("Input should be a one or two dimensional array.")
+        elif 1 in x.shape:
             x = x.ravel()
     if t is not None:
         if t.ndim != 1:
@@ -61,16 +104,205 @@ def inst_freq(x, t=None, L=1):
                                 "array.")
             else:
                 t = t.ravel()
+    if L < 1:
+        raise ValueError("L should be a positive integer.")
+
+    if method == "normalized":
+        x = hilbert(am_fm_decomposition(np.real(x))[0], axis=-1)
+    elif method == "phase":
+        if np.isrealobj(x):
+            x = hilbert(x, axis=-1)
+    elif method != "teager":
+        raise ValueError("Unknown method: {0}".format(method))
+
+    if method == "teager":
+        s = np.real(x)
+        psi_x = s[..., 1:-1] ** 2 - s[..., :-2] * s[..., 2:]
+        y = s[..., 2:] - s[..., :-2]
+        psi_y = y[..., 1:-1] ** 2 - y[..., :-2] * y[..., 2:]
+        psi_x = psi_x[..., 1:-1]
+        if L > 1:
+            psi_x = _sliding_sums(psi_x, 2 * L - 1)[0]
+            psi_y = _sliding_sums(psi_y, 2 * L - 1)[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_omega = np.clip(1 - psi_y / (2 * psi_x), -1, 1)
+        fnorm = np.arccos(cos_omega) / (4 * np.pi)
+        first = L + 1
+    elif L == 1:
+        fnorm = 0.5 * (np.angle(-x[..., 2:] * np.conj(x[..., :-2])) +
+                       np.pi) / (2 * np.pi)
+        first = 2
     else:
-        t = np.arange(2, len(x))
+        # Kay's estimator is the least squares slope of the unwrapped phase
+        # over 2 * L + 1 samples, i.e. a parabolic window over the wrapped
+        # phase increments.
+        dphi = np.angle(x[..., 1:] * np.conj(x[..., :-1]))
+        s0, s1, s2 = _sliding_sums(dphi, 2 * L, 3)
+        m1 = s1 - L * s0
+        m2 = s2 - 2 * L * s1 + L ** 2 * s0
+        slope = (L * (L + 1) * s0 - m1 - m2) / 2.0
+        slope /= L * (L + 1) * (2 * L + 1) / 3.0
+        fnorm = slope / (2 * np.pi)
+        first = L
 
-    fnorm = 0.5 * (angle(-x[t] * np.conj(x[t - 2])) + np.pi) / (2 * np.pi)
+    if t is None:
+        t = np.arange(first, first + fnorm.shape[-1])
+    else:
+        if np.any(t < first) or np.any(t >= first + fnorm.shape[-1]):
+            raise ValueError("Time instants should lie between {0} and {1} "
+                             "with these settings.".format(
+                                 first, first + fnorm.shape[-1] - 1))
+        fnorm = fnorm[..., t - first]
     return fnorm, t
 
 
-def boundary_conditions(x, t, z=None, nbsym=2):
+def _sliding_sums(g, width, n_orders=1, block=4096):
+    """Sliding sums of ``g``, ``i * g`` ... ``i ** (n_orders - 1) * g`` along
+    the last axis, where ``i`` is the position within a window of ``width``
+    consecutive samples.
+
+    The sums are obtained from cumulative sums, computed over overlapping
+    blocks so that their magnitude, and hence the rounding error, does not
+    grow with the length of the signal.
+
+    Returns
+    -------
+    sums : list
+        ``n_orders`` arrays with ``g.shape[-1] - width + 1`` windows each.
     """
-    Extend the signal beyond it's bounds w.r.t mirror symmetry.
+    n_windows = g.shape[-1] - width + 1
+    if n_windows < 1:
+        empty = np.zeros(g.shape[:-1] + (0,))
+        return [empty] * n_orders
+    block = max(block, width)
+    n_blocks = -(-n_windows // block)
+    span = block + width - 1
+    pad = [(0, 0)] * (g.ndim - 1) + [(0, n_blocks * block + width - 1 -
+                                      g.shape[-1])]
+    gp = np.ascontiguousarray(np.pad(g, pad, "constant"), dtype=float)
+    stride = gp.strides[-1]
+    blocks = as_strided(gp, shape=gp.shape[:-1] + (n_blocks, span),
+                        strides=gp.strides[:-1] + (block * stride, stride))
+
+    q = np.arange(span, dtype=float)
+    start = np.arange(block, dtype=float)
+    zeros = np.zeros(blocks.shape[:-1] + (1,))
+    totals = []
+    for k in range(n_orders):
+        c = np.concatenate((zeros, np.cumsum(q ** k * blocks, axis=-1)),
+                           axis=-1)
+        totals.append(c[..., width:width + block] - c[..., :block])
+
+    # Shift the block-local positions q to the window-local ones q - start.
+    sums = []
+    for p in range(n_orders):
+        acc = np.zeros(totals[0].shape)
+        for k in range(p + 1):
+            acc += comb(p, k) * (-start) ** (p - k) * totals[k]
+        acc = acc.reshape(acc.shape[:-2] + (n_blocks * block,))
+        sums.append(acc[..., :n_windows])
+    return sums
+
+
+def am_fm_decomposition(imfs, t=None, max_passes=10, tol=1e-3, kind="cubic"):
+    """Decompose IMFs into amplitude and frequency modulated parts, by
+    iterative normalization [1].
+
+    Each IMF is repeatedly divided by the spline envelope of its absolute
+    value until that envelope is within ``tol`` of one. The product of the
+    successive envelopes is the amplitude, and the normalized IMF is the
+    carrier, an oscillation between -1 and 1 whose Hilbert transform gives a
+    meaningful instantaneous frequency even where the amplitude modulation is
+    strong. All the IMFs are processed together, and each one stops being
+    normalized as soon as it has converged.
+
+    Parameters
+    ----------
+    imfs : array-like, shape (n,) or (n_imfs, n)
+        Intrinsic mode functions.
+
+    t : array-like, shape (n,)
+        Timestamps of the IMFs. (Default: ``numpy.arange(n)``)
+
+    max_passes : int
+        Maximum number of normalization passes. (Default: 10)
+
+    tol : float
+        Tolerance on the deviation of the envelope from one. (Default: 1e-3)
+
+    kind : str
+        Interpolation used for the envelopes, as in :func:`get_envelops`.
+        (Default: ``'cubic'``)
+
+    Returns
+    -------
+    carrier, amplitude : tuple
+        Arrays of the same shape as ``imfs``, such that
+        ``imfs == amplitude * carrier``.
+
+    Example
+    -------
+    >>> carrier, amplitude = am_fm_decomposition(imfs[:-1])
+    >>> fnorm, t = inst_freq(carrier)
+
+    References
+    ----------
+    .. [1] N. E. Huang et al., "On instantaneous frequency", Advances in
+       Adaptive Data Analysis, 2009.
+    """
+    shape = np.shape(imfs)
+    carrier = np.atleast_2d(np.array(imfs, dtype=float))
+    amplitude = np.ones(carrier.shape)
+    if t is None:
+        t = np.arange(carrier.shape[1])
+    active = np.arange(carrier.shape[0])
+    for _ in range(max_passes):
+        if active.shape[0] == 0:
+            break
+        part = carrier[active]
+        env = _abs_envelope(part, t, kind)
+        converged = np.max(np.abs(env - 1), axis=1) <= tol
+        env = np.maximum(env, np.abs(part))
+        env[env == 0] = 1
+        carrier[active] = part / env
+        amplitude[active] *= env
+        active = active[~converged]
+    return carrier.reshape(shape), amplitude.reshape(shape)
+
+
+def _abs_envelope(x, t, kind="cubic"):
+    """Spline envelope through the maxima of the absolute value of each row
+    of ``x``, held flat beyond the outermost maxima."""
+    n_rows, n = x.shape
+    ax = np.abs(x)
+    _, _, rows, cols = _extrema_2d(ax)
+    # Rows without maxima get a flat envelope at their peak value.
+    empty = np.flatnonzero(np.bincount(rows, minlength=n_rows) == 0)
+    rows = np.hstack((rows, empty))
+    cols = np.hstack((cols, np.argmax(ax[empty], axis=1)))
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    vals = ax[rows, cols]
+    first, last = _row_bounds(rows)
+    ends = np.arange(n_rows)
+    rows = np.hstack((rows, ends, ends))
+    vals = np.hstack((vals, vals[first], vals[last]))
+    cols = np.hstack((cols, np.zeros((n_rows,), dtype=int),
+                      np.full((n_rows,), n - 1, dtype=int)))
+    order = np.lexsort((cols, rows))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    # Drop the end knots which coincide with a peak.
+    keep = np.ones(rows.shape, dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    return batch_interp(t[cols], vals, rows, t, n_rows, kind)
+
+
+def boundary_conditions(x, t, z=None, nbsym=2, indmin=None, indmax=None,
+                        mode="mirror"):
+    """
+    Extend the extrema of the signal beyond it's bounds, by default w.r.t
+    mirror symmetry.
 
     Parameters
     ----------
@@ -87,17 +319,62 @@ def boundary_conditions(x, t, z=None, nbsym=2):
     nbsym : int
         Number of points added to each end of the signal.
 
+    indmin, indmax : array-like
+        Indices of the minima and maxima of ``x``, if already known. (By \
+        default these are computed from ``x``)
+
+    mode : str
+        How the extrema are extended:
+
+        * ``'mirror'``: mirror symmetry about the extrema closest to the
+          ends, as in [1].
+        * ``'periodic'``: the signal is assumed to be periodic.
+        * ``'antisymmetric'``: point symmetry about the end samples, which
+          turns maxima into minima and vice versa.
+        * ``'linear'``: linear extrapolation of the positions and values of
+          the two extrema closest to each end.
+        * ``'endpoints'``: the end samples are considered to be both minima
+          and maxima, as in :func:`get_envelops`.
+
+        All but ``'mirror'`` are computed with the same array operations
+        whatever the signal, and are cheaper and more robust on short
+        signals. ``nbsym`` is ignored by ``'endpoints'``. (Default:
+        ``'mirror'``)
+
     Returns
     -------
     timestamps : tuple
         timestamps and values of extended extrema, ordered as (minima \
         timestamps, maxima timestamps, minima values, maxima values.)
+
+    References
+    ----------
+    .. [1] G. Rilling, P. Flandrin and P. Goncalves, "On empirical mode
+       decomposition and its algorithms", IEEE-EURASIP Workshop on Nonlinear
+       Signal and Image Processing, 2003.
     """
-    indmax = argrelmax(x)[0]
-    indmin = argrelmin(x)[0]
-    lx = x.shape[0] - 1
+    if indmax is None:
+        indmax = argrelmax(x)[0]
+    if indmin is None:
+        indmin = argrelmin(x)[0]
     if indmin.shape[0] + indmax.shape[0] < 3:
         raise ValueError("Not enough extrema.")
+    if z is None:
+        z = x
+    if mode != "mirror":
+        try:
+            extend = _EXTENSIONS[mode]
+        except KeyError:
+            raise ValueError("Unknown boundary mode: {0}".format(mode))
+        if indmin.shape[0] == 0 or indmax.shape[0] == 0:
+            raise ValueError("Not enough extrema.")
+        return extend(t, z, indmin, indmax, nbsym)
+    return _mirror_extension(x, t, z, nbsym, indmin, indmax)
+
+
+def _mirror_extension(x, t, z, nbsym, indmin, indmax):
+    """Rilling's mirror symmetric extension of the extrema."""
+    lx = x.shape[0] - 1
 
     if indmax[0] < indmin[0]:
         if x[0] > x[indmin[0]]:
@@ -153,10 +430,12 @@ def boundary_conditions(x, t, z=None, nbsym=2):
         else:
             lmin = indmin[:np.min((indmin.shape[0], nbsym))][::-1]
         if lsym == 1:
-            raise Exception("Bug")
-        lsym = 1
-        tlmin = 2 * t[lsym] - t[lmin]
-        tlmax = 2 * t[lsym] - t[lmax]
+            # Mirroring cannot cover the start, use it as an extremum.
+            tlmin, tlmax, lmin, lmax = t[:1], t[:1], [0], [0]
+        else:
+            lsym = 1
+            tlmin = 2 * t[lsym] - t[lmin]
+            tlmax = 2 * t[lsym] - t[lmax]
 
     if (trmin[-1] < t[lx]) or (trmax[-1] < t[lx]):
         if rsym == indmax.shape[0]:
@@ -167,52 +446,428 @@ def boundary_conditions(x, t, z=None, nbsym=2):
                                  1]):indmin.shape[0]][::-1]
 
         if rsym == lx:
-            raise Exception("bug")
-        rsym = lx
-        trmin = 2 * t[rsym] - t[rmin]
-        trmax = 2 * t[rsym] - t[rmax]
+            # Mirroring cannot cover the end, use it as an extremum.
+            trmin, trmax, rmin, rmax = t[lx:], t[lx:], [lx], [lx]
+        else:
+            rsym = lx
+            trmin = 2 * t[rsym] - t[rmin]
+            trmax = 2 * t[rsym] - t[rmax]
 
-    if z is None:
-        z = x
     zlmax = z[lmax]
     zlmin = z[lmin]
     zrmax = z[rmax]
     zrmin = z[rmin]
 
-    tmin = map(np.array, [tlmin, t[indmin], trmin])
-    tmax = map(np.array, [tlmax, t[indmax], trmax])
-    zmin = map(np.array, [zlmin, z[indmin], zrmin])
-    zmax = map(np.array, [zlmax, z[indmax], zrmax])
+    tmin = np.hstack((tlmin, t[indmin], trmin))
+    tmax = np.hstack((tlmax, t[indmax], trmax))
+    zmin = np.hstack((zlmin, z[indmin], zrmin))
+    zmax = np.hstack((zlmax, z[indmax], zrmax))
+    return tmin, tmax, zmin, zmax
+
+
+def _periodic_extension(t, z, indmin, indmax, nbsym):
+    period = (t[-1] - t[0]) * t.shape[0] / (t.shape[0] - 1.0)
 
-    tmin, tmax, zmin, zmax = map(np.hstack, [tmin, tmax, zmin, zmax])
+    def _extend(ind):
+        ti = t[ind]
+        return (np.hstack((ti[-nbsym:] - period, ti, ti[:nbsym] + period)),
+                np.hstack((z[ind[-nbsym:]], z[ind], z[ind[:nbsym]])))
+
+    (tmin, zmin), (tmax, zmax) = _extend(indmin), _extend(indmax)
+    return tmin, tmax, zmin, zmax
+
+
+def _antisymmetric_extension(t, z, indmin, indmax, nbsym):
+    def _extend(ind, other):
+        # Extrema of the other kind, reflected through the end samples.
+        left, right = other[:nbsym][::-1], other[-nbsym:][::-1]
+        return (np.hstack((2 * t[0] - t[left], t[ind], 2 * t[-1] - t[right])),
+                np.hstack((2 * z[0] - z[left], z[ind], 2 * z[-1] - z[right])))
+
+    (tmin, zmin), (tmax, zmax) = _extend(indmin, indmax), \
+        _extend(indmax, indmin)
+    return tmin, tmax, zmin, zmax
+
+
+def _linear_extension(t, z, indmin, indmax, nbsym):
+    steps = np.arange(nbsym, 0, -1)
+    span = t[-1] - t[0]
+
+    def _extend(ind):
+        # With a single extremum, step by the length of the signal instead.
+        ti, zi = t[ind], z[ind]
+        i2 = min(1, ind.shape[0] - 1)
+        dtl, dzl = ti[i2] - ti[0], zi[i2] - zi[0]
+        dtr, dzr = ti[-1] - ti[-1 - i2], zi[-1] - zi[-1 - i2]
+        dtl, dtr = np.where(dtl > 0, dtl, span), np.where(dtr > 0, dtr, span)
+        return (np.hstack((ti[0] - steps * dtl, ti, ti[-1] + steps[::-1] * dtr)),
+                np.hstack((zi[0] - steps * dzl, zi, zi[-1] + steps[::-1] * dzr)))
+
+    (tmin, zmin), (tmax, zmax) = _extend(indmin), _extend(indmax)
+    return tmin, tmax, zmin, zmax
+
+
+def _endpoints_extension(t, z, indmin, indmax, nbsym):
+    ends = np.array([0, t.shape[0] - 1])
+    tmin = np.hstack((t[ends[:1]], t[indmin], t[ends[1:]]))
+    tmax = np.hstack((t[ends[:1]], t[indmax], t[ends[1:]]))
+    zmin = np.hstack((z[ends[:1]], z[indmin], z[ends[1:]]))
+    zmax = np.hstack((z[ends[:1]], z[indmax], z[ends[1:]]))
     return tmin, tmax, zmin, zmax
 
 
-def get_envelops(x, t=None):
-    """ Find the upper and lower envelopes of the array `x`.
+_EXTENSIONS = {"periodic": _periodic_extension,
+               "antisymmetric": _antisymmetric_extension,
+               "linear": _linear_extension,
+               "endpoints": _endpoints_extension}
+
+
+def get_envelops(x, t=None, kind="cubic"):
+    """Find the upper and lower envelopes of the array `x`.
+
+    The start and the end of the signal are considered to be extrema, and
+    the envelopes interpolate the maxima and the minima respectively.
+
+    Parameters
+    ----------
+    x : array-like, shape (n,) or (n_signals, n)
+        Signal, or signals sharing the same time instants. All the signals
+        are enveloped at once, without looping over them.
+
+    t : array-like, shape (n,)
+        Timestamps of the signal. (Default: ``numpy.arange(n)``)
+
+    kind : str
+        Interpolation used for the envelopes: ``'cubic'`` (not-a-knot cubic
+        spline, as with :func:`scipy.interpolate.splrep`), ``'pchip'`` or
+        ``'linear'``. (Default: ``'cubic'``)
+
+    Returns
+    -------
+    upper, lower : tuple
+        Upper and lower envelopes, of the same shape as ``x``.
     """
+    x = np.asarray(x)
+    x2d = np.atleast_2d(x)
+    n_rows, n = x2d.shape
     if t is None:
-        t = np.arange(x.shape[0])
-    maxima = argrelmax(x)[0]
-    minima = argrelmin(x)[0]
+        t = np.arange(n)
+
+    rmin, cmin, rmax, cmax = _extrema_2d(x2d)
+    envelops = []
+    for rows, cols in ((rmax, cmax), (rmin, cmin)):
+        # consider the start and end to be extrema
+        ends = np.arange(n_rows)
+        rows = np.hstack((rows, ends, ends))
+        cols = np.hstack((cols, np.zeros((n_rows,), dtype=int),
+                          np.full((n_rows,), n - 1, dtype=int)))
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        env = batch_interp(t[cols], x2d[rows, cols], rows, t, n_rows, kind)
+        envelops.append(env.reshape(x.shape))
+    return tuple(envelops)
+
+
+def _row_bounds(rows):
+    """Flags marking the first and the last knot of every row of ragged,
+    row-sorted knots."""
+    first = np.ones(rows.shape, dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    last = np.ones(rows.shape, dtype=bool)
+    last[:-1] = first[1:]
+    return first, last
+
+
+def _knot_slopes(xk, yk, rows, kind):
+    """Derivatives at the knots of ragged sets of interpolation knots."""
+    n_knots = xk.shape[0]
+    first, last = _row_bounds(rows)
+    starts = np.flatnonzero(first)
+    counts = np.diff(np.hstack((starts, [n_knots])))
+    count = np.repeat(counts, counts)
+
+    # Interval widths and slopes around every knot, padded so that the
+    # neighbours of the first and last knots can be indexed safely. Intervals
+    # straddling two rows are never used.
+    h = np.hstack((np.diff(xk), [1.0]))
+    h[last] = 1.0
+    delta = np.hstack((np.diff(yk), [0.0])) / h
+    delta[last] = 0.0
+    hp = np.hstack(([1.0], h, [1.0, 1.0]))
+    dp = np.hstack(([0.0], delta, [0.0, 0.0]))
+    i = np.arange(n_knots) + 1
+    h_prev, h_next, h_next2, h_prev2 = hp[i - 1], hp[i], hp[i + 1], hp[i - 2]
+    d_prev, d_next, d_next2, d_prev2 = dp[i - 1], dp[i], dp[i + 1], dp[i - 2]
+    interior = ~(first | last)
+
+    if kind == "pchip":
+        slopes = np.zeros((n_knots,))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w1 = 2 * h_next + h_prev
+            w2 = h_next + 2 * h_prev
+            whmean = (w1 / d_prev + w2 / d_next) / (w1 + w2)
+            flat = (np.sign(d_prev) != np.sign(d_next)) | (d_prev == 0) | \
+                (d_next == 0)
+            slopes[interior] = np.where(flat, 0, 1.0 / whmean)[interior]
+
+        def _edge(h0, h1, m0, m1):
+            d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+            d[np.sign(d) != np.sign(m0)] = 0
+            clip = (np.sign(m0) != np.sign(m1)) & (np.abs(d) > 3 * np.abs(m0))
+            d[clip] = 3 * m0[clip]
+            return d
+
+        slopes[first] = _edge(h_next, h_next2, d_next, d_next2)[first]
+        slopes[last] = _edge(h_prev, h_prev2, d_prev, d_prev2)[last]
+        two = count == 2
+        slopes[two & first] = d_next[two & first]
+        slopes[two & last] = d_prev[two & last]
+        return slopes
+
+    # Not-a-knot cubic splines of all the rows, solved as a single banded
+    # system whose blocks do not interact. Rows with fewer than four knots
+    # are a parabola or a straight line, whose slopes are explicit.
+    ab = np.zeros((3, n_knots))
+    b = np.zeros((n_knots,))
+    full = count >= 4
+    k = np.flatnonzero(interior & full)
+    ab[0, k + 1] = h_prev[k]
+    ab[1, k] = 2 * (h_prev[k] + h_next[k])
+    ab[2, k - 1] = h_next[k]
+    b[k] = 3 * (h_next[k] * d_prev[k] + h_prev[k] * d_next[k])
+    k = np.flatnonzero(first & full)
+    d = h_next[k] + h_next2[k]
+    ab[1, k] = h_next2[k]
+    ab[0, k + 1] = d
+    b[k] = ((h_next[k] + 2 * d) * h_next2[k] * d_next[k] +
+            h_next[k] ** 2 * d_next2[k]) / d
+    k = np.flatnonzero(last & full)
+    d = h_prev[k] + h_prev2[k]
+    ab[1, k] = h_prev2[k]
+    ab[2, k - 1] = d
+    b[k] = (h_prev[k] ** 2 * d_prev2[k] +
+            (2 * d + h_prev[k]) * h_prev2[k] * d_prev[k]) / d
+
+    k = np.flatnonzero(~full)
+    ab[1, k] = 1
+    b[k] = np.where(first, d_next, d_prev)[k]
+    three = count == 3
+    k = np.flatnonzero(three & first)
+    b[k] = d_next[k] - h_next[k] * (d_next2[k] - d_next[k]) / \
+        (h_next[k] + h_next2[k])
+    k = np.flatnonzero(three & interior)
+    b[k] = d_prev[k] + h_prev[k] * (d_next[k] - d_prev[k]) / \
+        (h_prev[k] + h_next[k])
+    k = np.flatnonzero(three & last)
+    b[k] = d_prev[k] + h_prev[k] * (d_prev[k] - d_prev2[k]) / \
+        (h_prev[k] + h_prev2[k])
+    return linalg.solve_banded((1, 1), ab, b)
+
+
+def batch_interp(xk, yk, rows, t, n_rows, kind="cubic", slopes=None):
+    """Interpolate ragged sets of knots, one per signal, onto a common grid.
+
+    Parameters
+    ----------
+    xk, yk : array-like
+        Abscissae and values of the knots of all the signals, concatenated.
+
+    rows : array-like
+        Signal to which each knot belongs. Knots must be sorted by signal,
+        and by abscissa within each signal.
+
+    t : array-like
+        Points at which every signal is evaluated.
+
+    n_rows : int
+        Number of signals. Every one of them needs at least two knots.
+
+    kind : str
+        ``'cubic'`` (not-a-knot cubic spline), ``'pchip'`` or ``'linear'``.
+        (Default: ``'cubic'``)
+
+    slopes : array-like
+        Derivatives at the knots, if already known.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Array of shape (n_rows, len(t)) of interpolated values.
+    """
+    if kind not in ("cubic", "pchip", "linear"):
+        raise ValueError("Unknown interpolation: {0}".format(kind))
+    xk = np.asarray(xk, dtype=float)
+    yk = np.asarray(yk)
+    rows = np.asarray(rows)
+    t = np.asarray(t, dtype=float)
+    n_knots, n = xk.shape[0], t.shape[0]
+
+    # Locate the interval of each evaluation point by sorting points and
+    # knots together, knots first on ties.
+    qrows = np.repeat(np.arange(n_rows), n)
+    keys_row = np.hstack((rows, qrows))
+    keys_t = np.hstack((xk, np.tile(t, n_rows)))
+    is_knot = np.hstack((np.ones((n_knots,), dtype=int),
+                         np.zeros((n_rows * n,), dtype=int)))
+    order = np.lexsort((1 - is_knot, keys_t, keys_row))
+    seg = np.empty((n_knots + n_rows * n,), dtype=int)
+    seg[order] = np.cumsum(is_knot[order]) - 1
+    seg = seg[n_knots:]
+    bounds = np.searchsorted(rows, np.arange(n_rows + 1))
+    seg = np.clip(seg, bounds[qrows], bounds[qrows + 1] - 2)
+
+    x0, x1 = xk[seg], xk[seg + 1]
+    y0, y1 = yk[seg], yk[seg + 1]
+    h = x1 - x0
+    tau = (np.tile(t, n_rows) - x0) / h
+    if kind == "linear":
+        values = y0 + tau * (y1 - y0)
+    else:
+        if slopes is None:
+            slopes = _knot_slopes(xk, yk, rows, kind)
+        tau2 = tau * tau
+        tau3 = tau2 * tau
+        values = (2 * tau3 - 3 * tau2 + 1) * y0 + \
+            (tau3 - 2 * tau2 + tau) * h * slopes[seg] + \
+            (-2 * tau3 + 3 * tau2) * y1 + (tau3 - tau2) * h * slopes[seg + 1]
+    return values.reshape(n_rows, n)
+
+
+class SplineCache(object):
+    """Cache of the interpolation operators of cubic splines through given
+    knot positions, evaluated at fixed time instants.
+
+    The interpolating cubic spline of :func:`scipy.interpolate.splrep`
+    depends linearly on the values at the knots. For a given set of knot
+    positions, the sparse LU factorization of its collocation matrix and its
+    B-spline basis at the time instants are computed once, and interpolating
+    new values then only takes a back-substitution and a sparse product.
+    This pays off during sifting, where the extrema of a mode often stay put
+    from one iteration to the next while their values change.
+
+    Parameters
+    ----------
+    t : array-like
+        Time instants at which the splines are evaluated.
+
+    size : int
+        Number of sets of knot positions kept. (Default: 4)
+
+    Example
+    -------
+    >>> splines = SplineCache(t)
+    >>> env = splines.interp(tmax, mmax)
+    >>> env = splines.interp(tmax, mmax - mean[indmax])  # reuses the operator
+    >>> splines.stats()
+    {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    """
+
+    def __init__(self, t, size=4):
+        self.t = t
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+
+    def _operator(self, tk):
+        knots = np.hstack(([tk[0]] * 4, tk[2:-2], [tk[-1]] * 4))
+        collocation = BSpline.design_matrix(tk, knots, 3).tocsc()
+        return splu(collocation), BSpline.design_matrix(self.t, knots, 3)
 
-    # consider the start and end to be extrema
+    def interp(self, tk, yk):
+        """Evaluate the interpolating cubic spline through ``(tk, yk)`` at the
+        time instants of the cache.
 
-    ext_maxima = np.zeros((maxima.shape[0] + 2,), dtype=int)
-    ext_maxima[1:-1] = maxima
-    ext_maxima[0] = 0
-    ext_maxima[-1] = t.shape[0] - 1
+        Parameters
+        ----------
+        tk : array-like
+            Increasing knot positions.
 
-    ext_minima = np.zeros((minima.shape[0] + 2,), dtype=int)
-    ext_minima[1:-1] = minima
-    ext_minima[0] = 0
-    ext_minima[-1] = t.shape[0] - 1
+        yk : array-like
+            Values at the knots.
 
-    tck = interpolate.splrep(t[ext_maxima], x[ext_maxima])
-    upper = interpolate.splev(t, tck)
-    tck = interpolate.splrep(t[ext_minima], x[ext_minima])
-    lower = interpolate.splev(t, tck)
-    return upper, lower
+        Returns
+        -------
+        values : numpy.ndarray
+            Values of the spline at ``t``.
+        """
+        key = tk.tobytes()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries[key] = self._entries.pop(key)
+            if entry[0] is None:
+                # Restored by set_state, and factorized on first use.
+                entry = self._operator(entry[2]) + (entry[2],)
+                self._entries[key] = entry
+            lu, basis = entry[:2]
+            return basis.dot(lu.solve(np.asarray(yk, dtype=float)))
+        self.misses += 1
+        if key not in self._seen:
+            # Knot positions seen for the first time are unlikely to come up
+            # again, so they are not worth factorizing yet.
+            self._seen[key] = np.array(tk)
+            if len(self._seen) > self.size:
+                self._seen.popitem(last=False)
+            return splev(self.t, splrep(tk, yk))
+        try:
+            entry = self._operator(tk)
+        except (ValueError, RuntimeError, AttributeError):
+            # Out of range or repeated knots (or scipy < 1.8, which lacks
+            # BSpline.design_matrix), left to FITPACK to deal with.
+            return splev(self.t, splrep(tk, yk))
+        self._entries[key] = entry + (np.array(tk),)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        lu, basis = entry
+        return basis.dot(lu.solve(np.asarray(yk, dtype=float)))
+
+    def get_state(self):
+        """Knot positions known to the cache, from which :meth:`set_state`
+        restores it in a state where it gives identical results.
+
+        Returns
+        -------
+        seen, factorized : tuple
+            Lists of the knot positions seen and factorized, from the least
+            to the most recently used.
+        """
+        return (list(self._seen.values()),
+                [entry[2] for entry in self._entries.values()])
+
+    def set_state(self, seen, factorized):
+        """Restore the knot positions returned by :meth:`get_state`. The
+        factorizations are only computed again when they are used."""
+        self._seen = OrderedDict((tk.tobytes(), tk) for tk in seen)
+        self._entries = OrderedDict()
+        for tk in factorized:
+            self._entries[tk.tobytes()] = (None, None, tk)
+
+    def __getstate__(self):
+        # Sparse LU factorizations cannot be pickled, so only the knot
+        # positions are kept.
+        return {"t": self.t, "size": self.size, "hits": self.hits,
+                "misses": self.misses, "state": self.get_state()}
+
+    def __setstate__(self, state):
+        self.t = state["t"]
+        self.size = state["size"]
+        self.hits = state["hits"]
+        self.misses = state["misses"]
+        self.set_state(*state["state"])
+
+    def stats(self):
+        """Usage statistics of the cache.
+
+        Returns
+        -------
+        stats : dict
+            Number of hits and misses, and the proportion of hits.
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": float(self.hits) / total if total else 0.0}
 
 
 def extr(x):
@@ -240,7 +895,7 @@ def extr(x):
             dz = np.diff(np.r_[0, zer, 0])
             debz = find(dz == 1)
             finz = find(dz == -1) - 1
-            indz = np.round((debz + finz) / 2)
+            indz = np.round((debz + finz) / 2.0)
         else:
             indz = iz
         indzer = np.sort(np.hstack([indzer, indz]))
@@ -249,3 +904,153 @@ def extr(x):
     indmin = argrelmin(x)[0]
 
     return indmin, indmax, indzer
+
+
+def batch_extr(x):
+    """Extract the indices of the extrema and zero crossings of every row of a
+    2-D array in a single vectorized pass.
+
+    Parameters
+    ----------
+    x : array-like, shape (n_signals, n_samples)
+        input signals
+
+    Returns
+    -------
+    minimas : tuple
+        lists of arrays holding, for each row, the indices of minima, maxima
+        and zero crossings. These are the same as those returned by
+        :func:`extr` on the individual rows.
+    """
+    x = np.atleast_2d(x)
+    n_rows = x.shape[0]
+    rmin, cmin, rmax, cmax = _extrema_2d(x)
+
+    rzer, czer = np.nonzero(x[:, :-1] * x[:, 1:] < 0)
+    zer = x == 0
+    if np.any(zer):
+        # Runs of exact zeros count as one crossing, located at their middle.
+        dz = np.diff(np.pad(zer.astype(int), ((0, 0), (1, 1)), "constant"),
+                     axis=1)
+        rdeb, debz = np.nonzero(dz == 1)
+        finz = np.nonzero(dz == -1)[1] - 1
+        indz = np.round((debz + finz) / 2.0).astype(int)
+        rzer = np.hstack((rzer, rdeb))
+        czer = np.hstack((czer, indz))
+        order = np.lexsort((czer, rzer))
+        rzer, czer = rzer[order], czer[order]
+
+    def _split(rows, cols):
+        return np.split(cols, np.searchsorted(rows, np.arange(1, n_rows)))
+
+    return _split(rmin, cmin), _split(rmax, cmax), _split(rzer, czer)
+
+
+def gzc_freq(extrema, n_samples, t=None, per_sample=True):
+    """Estimate the instantaneous frequency of IMFs from their extrema and
+    zero crossings, with the generalized zero-crossing method [1].
+
+    The extrema and zero crossings of an IMF split it into quarter waves.
+    The frequency over each quarter wave is the weighted mean of the
+    frequencies of the quarter wave itself (weight 4), of the two half
+    waves (weight 2) and of the four full waves (weight 1) which contain
+    it. Near the ends, the waves which do not fit in the IMF are left out.
+    Only the indices returned by :func:`extr` or :func:`batch_extr` are
+    used, so the estimate costs next to nothing once those are known, and
+    needs no Hilbert transform.
+
+    Parameters
+    ----------
+    extrema : tuple
+        Indices of the minima, maxima and zero crossings of an IMF, as
+        returned by :func:`extr`, or of several IMFs, as returned by
+        :func:`batch_extr`.
+
+    n_samples : int
+        Length of the IMFs.
+
+    t : array-like
+        Sampling time instants. (Default: ``None``, meaning that
+        frequencies are normalized by the sampling frequency)
+
+    per_sample : bool
+        Whether to return the frequency at every sample, or over every
+        quarter wave. (Default: ``True``)
+
+    Returns
+    -------
+    freq : numpy.ndarray
+        If ``per_sample``, the frequency at every sample of each IMF, of
+        shape (n_samples,) for the output of :func:`extr` and (n_imfs,
+        n_samples) for that of :func:`batch_extr`. Samples before the
+        first or after the last extremum or zero crossing are ``nan``.
+
+    rows, starts, stops, freq : tuple
+        Otherwise, the IMF to which each quarter wave belongs, its first
+        and last samples, and its frequency.
+
+    Example
+    -------
+    >>> freq = gzc_freq(extr(imf), imf.shape[0])
+    >>> freqs = gzc_freq(batch_extr(imfs[:-1]), imfs.shape[1], t)
+
+    References
+    ----------
+    .. [1] N. E. Huang et al., "On instantaneous frequency", Advances in
+       Adaptive Data Analysis, 2009.
+    """
+    single = not isinstance(extrema[0], list)
+    indices = [[ind] if single else ind for ind in extrema]
+    n_rows = len(indices[0])
+    counts = [sum(len(ind[i]) for ind in indices) for i in range(n_rows)]
+    rows = np.repeat(np.arange(n_rows), counts)
+    cols = np.hstack([np.hstack([ind[i] for ind in indices])
+                      for i in range(n_rows)] + [[]]).astype(int)
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    keep = np.ones(rows.shape, dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows, cols = rows[keep], cols[keep]
+    times = cols.astype(float) if t is None else np.asarray(t)[cols]
+
+    # Sums of the weighted frequencies of the waves spanning each quarter
+    # wave, i.e. each interval between consecutive knots, and of the weights.
+    n_waves = max(cols.shape[0] - 1, 0)
+    total = np.zeros((n_waves,))
+    weights = np.zeros((n_waves,))
+    for span, weight in ((1, 4), (2, 2), (4, 1)):
+        if cols.shape[0] <= span:
+            continue
+        valid = rows[span:] == rows[:-span]
+        with np.errstate(divide="ignore"):
+            freq = span / (4.0 * (times[span:] - times[:-span]))
+        first = np.flatnonzero(valid)
+        for shift in range(span):
+            total[first + shift] += weight * freq[first]
+            weights[first + shift] += weight
+    valid = rows[1:] == rows[:-1]
+    freq = total[valid] / weights[valid]
+    rows, starts, stops = rows[:-1][valid], cols[:-1][valid], cols[1:][valid]
+    if not per_sample:
+        return rows, starts, stops, freq
+
+    out = np.full((n_rows, n_samples), np.nan)
+    lengths = stops - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) -
+                                                   lengths, lengths)
+    flat = np.repeat(rows * n_samples + starts, lengths) + offsets
+    out.ravel()[flat] = np.repeat(freq, lengths)
+    last = np.flatnonzero(np.r_[rows[1:] != rows[:-1], True]) \
+        if rows.shape[0] else rows
+    out[rows[last], stops[last]] = freq[last]
+    return out[0] if single else out
+
+
+def _extrema_2d(x):
+    """Rows and columns of the strict local minima and maxima of a 2-D array,
+    in row-major order."""
+    dx = np.diff(x, axis=1)
+    rising, falling = dx[:, :-1], dx[:, 1:]
+    rmax, cmax = np.nonzero((rising > 0) & (falling < 0))
+    rmin, cmin = np.nonzero((rising < 0) & (falling > 0))
+    return rmin, cmin + 1, rmax, cmax + 1
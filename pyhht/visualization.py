@@ -9,49 +9,106 @@
 """Visualization functions for PyHHT."""
 
 
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
+from scipy.signal import hilbert
+from pyhht.utils import inst_freq
 
 
-def plot_imfs(signal, imfs, time_samples=None, fignum=None):
-    """Visualize decomposed signals.
+def minmax_decimate(time_samples, values, n_buckets):
+    """Reduce signals to the extrema of each of ``n_buckets`` time buckets.
+
+    Drawing the minimum and the maximum of every pixel-wide bucket yields the
+    same picture as drawing every sample, at a cost which depends on the
+    number of buckets rather than on the length of the signals.
 
     Parameters
     ----------
-    signal : array-like
-        Analyzed signal
-
-    time_samples : array-like
+    time_samples : array-like, shape (n_samples,)
         time instants
 
-    imfs : array-like, shape (n_imfs, lenght_of_signal)
-        intrinsic mode functions of the signal
+    values : array-like, shape (n_signals, n_samples)
+        signals sharing the time instants, decimated all at once
 
-    fignum : int
-        (optional) number of the figure to display
+    n_buckets : int
+        number of buckets, typically the width of the axes in pixels
 
     Returns
     -------
-    None
+    time_samples, values : tuple
+        The decimated time instants, of shape (2 * n_buckets,), and signals,
+        of shape (n_signals, 2 * n_buckets). The inputs are returned
+        unchanged if they have fewer than ``2 * n_buckets`` samples.
+    """
+    values = np.atleast_2d(values)
+    n_samples = values.shape[1]
+    if n_samples <= 2 * n_buckets:
+        return time_samples, values
+    starts = np.linspace(0, n_samples, n_buckets + 1).astype(int)[:-1]
+    decimated = np.empty((values.shape[0], 2 * n_buckets), dtype=values.dtype)
+    decimated[:, ::2] = np.minimum.reduceat(values, starts, axis=1)
+    decimated[:, 1::2] = np.maximum.reduceat(values, starts, axis=1)
+    return np.repeat(time_samples[starts], 2), decimated
 
-    Example:
-    -------
 
-    >>> plot_imfs(signal)
+def _follow_zoom(ax, line, time_samples, values, n_buckets, blit=False):
+    """Re-decimate the data of a line for the visible time range whenever the
+    axes are zoomed or panned."""
+    canvas = ax.figure.canvas
+    blit = blit and getattr(canvas, "supports_blit", False)
+    background = {}
 
-    .. plot:: ../../docs/examples/emd_fmsin.py
-    """
+    def on_draw(event):
+        background["bbox"] = canvas.copy_from_bbox(ax.bbox)
+        ax.draw_artist(line)
+
+    def on_xlim_changed(ax):
+        lo, hi = np.searchsorted(time_samples, sorted(ax.get_xlim()))
+        lo, hi = max(lo - 1, 0), min(hi + 1, time_samples.shape[0])
+        t, v = minmax_decimate(time_samples[lo:hi], values[lo:hi], n_buckets)
+        line.set_data(t, v[0])
+        if "bbox" in background:
+            # The axes carry neither ticks nor grid, so their background
+            # does not depend on the limits and can be restored as is.
+            canvas.restore_region(background["bbox"])
+            ax.draw_artist(line)
+            canvas.blit(ax.bbox)
+
+    if blit:
+        line.set_animated(True)
+        canvas.mpl_connect("draw_event", on_draw)
+    ax.callbacks.connect("xlim_changed", on_xlim_changed)
+
+
+def _draw_imfs(fig, signal, imfs, time_samples=None, lod=True, blit=False):
+    """Draw a decomposition on the axes of a figure."""
     if time_samples is None:
         time_samples = np.arange(signal.shape[0])
 
     n_imfs = imfs.shape[0]
 
-    plt.figure(num=fignum)
-    axis_extent = max(np.max(np.abs(imfs[:-1, :]), axis=0))
+    axis_extent = np.max(np.abs(imfs[:-1, :]))
+
+    values = np.vstack((signal, imfs))
+    n_buckets = int(fig.get_figwidth() * fig.dpi)
+    if lod:
+        t_plot, v_plot = minmax_decimate(time_samples, values, n_buckets)
+    else:
+        t_plot, v_plot = time_samples, values
+
+    lines = []
+
+    def _plot(ax, i, *args):
+        line, = ax.plot(t_plot, v_plot[i], *args)
+        lines.append((ax, line, values[i]))
 
     # Plot original signal
-    ax = plt.subplot(n_imfs, 1, 1)
-    ax.plot(time_samples, signal)
+    ax = fig.add_subplot(n_imfs, 1, 1)
+    _plot(ax, 0)
     ax.axis([time_samples[0], time_samples[-1], signal.min(), signal.max()])
     ax.tick_params(which='both', left=False, bottom=False, labelleft=False,
             labelbottom=False)
@@ -61,8 +118,8 @@ def plot_imfs(signal, imfs, time_samples=None, fignum=None):
 
     # Plot the IMFs
     for i in range(n_imfs - 1):
-        ax = plt.subplot(n_imfs, 1, i + 2)
-        ax.plot(time_samples, imfs[i, :])
+        ax = fig.add_subplot(n_imfs, 1, i + 2)
+        _plot(ax, i + 1)
         ax.axis([time_samples[0], time_samples[-1], -axis_extent, axis_extent])
         ax.tick_params(which='both', left=False, bottom=False, labelleft=False,
                 labelbottom=False)
@@ -70,12 +127,310 @@ def plot_imfs(signal, imfs, time_samples=None, fignum=None):
         ax.set_ylabel('imf' + str(i + 1))
 
     # Plot the residue
-    ax = plt.subplot(n_imfs + 1, 1, n_imfs + 1)
-    ax.plot(time_samples, imfs[-1, :], 'r')
+    ax = fig.add_subplot(n_imfs + 1, 1, n_imfs + 1)
+    _plot(ax, n_imfs, 'r')
     ax.axis('tight')
     ax.tick_params(which='both', left=False, bottom=False, labelleft=False,
             labelbottom=False)
     ax.grid(False)
     ax.set_ylabel('res.')
 
-    plt.show()
+    if lod:
+        for ax, line, value in lines:
+            _follow_zoom(ax, line, time_samples, value, n_buckets, blit)
+
+
+def imfs_figure(signal, imfs, time_samples=None, lod=True, **kwargs):
+    """Build a figure of decomposed signals without using pyplot.
+
+    The figure is attached to an Agg canvas and is not registered with
+    pyplot, so this function does not block, needs no display and can be
+    called from worker threads.
+
+    Parameters
+    ----------
+    signal : array-like
+        Analyzed signal
+
+    imfs : array-like, shape (n_imfs, lenght_of_signal)
+        intrinsic mode functions of the signal
+
+    time_samples : array-like
+        time instants
+
+    lod : bool
+        (optional) whether to decimate the signals to the width of the
+        figure, as in :func:`plot_imfs`. (Default: ``True``)
+
+    kwargs :
+        keyword arguments passed on to :class:`matplotlib.figure.Figure`,
+        like ``figsize`` and ``dpi``.
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+
+    Example:
+    -------
+
+    >>> fig = imfs_figure(signal, imfs)
+    >>> fig.savefig("emd.png")
+    """
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    _draw_imfs(fig, signal, imfs, time_samples, lod=lod)
+    return fig
+
+
+def _export_one(args):
+    """Render a single decomposition to a file."""
+    fname, signal, imfs, time_samples, kwargs = args
+    fig = imfs_figure(signal, imfs, time_samples, **kwargs)
+    fig.savefig(fname)
+    fig.clf()
+    return fname
+
+
+def export_imfs(decompositions, fnames, n_jobs=None, **kwargs):
+    """Render many decompositions to image files across a process pool.
+
+    Figures are built with :func:`imfs_figure` on the Agg backend in the
+    worker processes and written to disk as soon as they are drawn, and at
+    most ``2 * n_jobs`` decompositions are in flight at a time, so neither
+    open figures nor pending inputs accumulate.
+
+    Parameters
+    ----------
+    decompositions : iterable
+        ``(signal, imfs)`` or ``(signal, imfs, time_samples)`` tuples.
+
+    fnames : iterable
+        Paths of the output files. The format is inferred from the extension,
+        e.g. ``.png`` or ``.svg``.
+
+    n_jobs : int
+        (optional) number of worker processes. If 1, the figures are rendered
+        in the calling process. (Default: the number of CPUs)
+
+    kwargs :
+        keyword arguments passed on to :func:`imfs_figure`.
+
+    Returns
+    -------
+    fnames : list
+        Paths of the files written, in the order in which they were
+        finished.
+    """
+    jobs = ((fname,) + tuple(d) + (None,) * (3 - len(d)) + (kwargs,)
+            for d, fname in zip(decompositions, fnames))
+    if n_jobs == 1:
+        return [_export_one(job) for job in jobs]
+
+    if n_jobs is None:
+        n_jobs = cpu_count()
+    done = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        limit = 2 * n_jobs
+        pending = set()
+        for job in jobs:
+            pending.add(pool.submit(_export_one, job))
+            if len(pending) >= limit:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done.extend(f.result() for f in finished)
+        done.extend(f.result() for f in pending)
+    return done
+
+
+def hilbert_spectrum(imfs, time_samples=None, n_times=512, n_freqs=256,
+                     fmax=None, power=False, chunk_size=2 ** 16):
+    """Rasterize the Hilbert spectrum of a decomposition.
+
+    The instantaneous frequency and amplitude of every sample of every IMF
+    are binned into an image of ``n_freqs`` by ``n_times`` pixels, each
+    pixel accumulating the amplitudes which fall into it. The samples are
+    binned a chunk at a time, so the memory used besides the analytic
+    signals of the IMFs depends on the size of the image and on
+    ``chunk_size``, not on the length of the signal.
+
+    Parameters
+    ----------
+    imfs : array-like, shape (n_imfs, lenght_of_signal)
+        intrinsic mode functions of the signal, the last of which is the
+        residue and is left out, as returned by
+        :meth:`pyhht.emd.EMD.decompose`
+
+    time_samples : array-like
+        (optional) uniformly spaced time instants. If given, frequencies are
+        in cycles per unit of time, otherwise they are normalized by the
+        sampling frequency.
+
+    n_times, n_freqs : int
+        (optional) number of columns and of rows of the image.
+        (Default: 512 and 256)
+
+    fmax : float
+        (optional) highest frequency of the image. (Default: the Nyquist
+        frequency)
+
+    power : bool
+        (optional) whether to accumulate squared amplitudes, i.e. energy,
+        instead of amplitudes. (Default: ``False``)
+
+    chunk_size : int
+        (optional) number of samples binned at a time.
+
+    Returns
+    -------
+    spectrum : numpy.ndarray, shape (n_freqs, n_times)
+        the rasterized spectrum, lowest frequencies first.
+
+    extent : tuple
+        ``(t_min, t_max, 0, fmax)``, as expected by ``imshow``.
+
+    Example:
+    -------
+
+    >>> spectrum, extent = hilbert_spectrum(imfs, t, n_times=800)
+    >>> plt.imshow(spectrum, extent=extent, origin="lower", aspect="auto")
+    """
+    imfs = np.atleast_2d(imfs)
+    n_samples = imfs.shape[1]
+    fs = 1.0
+    if time_samples is not None and n_samples > 1:
+        fs = (n_samples - 1) / float(time_samples[-1] - time_samples[0])
+    if fmax is None:
+        fmax = fs / 2.0
+    extent = (0, n_samples - 1) if time_samples is None else \
+        (time_samples[0], time_samples[-1])
+    extent = extent + (0, fmax)
+
+    spectrum = np.zeros((n_freqs * n_times,))
+    modes = imfs[:-1]
+    if modes.shape[0] == 0 or n_samples < 3:
+        return spectrum.reshape(n_freqs, n_times), extent
+    analytic = hilbert(modes, axis=-1)
+    for start in range(0, n_samples - 2, chunk_size):
+        stop = min(start + chunk_size, n_samples - 2)
+        # The estimates of the chunk are at the samples start + 2 to stop + 1.
+        fnorm = np.atleast_2d(inst_freq(analytic[:, start:stop + 2])[0])
+        amplitude = np.abs(analytic[:, start + 2:stop + 2])
+        if power:
+            amplitude = amplitude ** 2
+        rows = np.floor(fnorm * (fs * n_freqs / fmax)).astype(int)
+        cols = np.arange(start + 2, stop + 2) * n_times // n_samples
+        pixels = rows * n_times + cols
+        keep = (rows >= 0) & (rows < n_freqs)
+        spectrum += np.bincount(pixels[keep], weights=amplitude[keep],
+                                minlength=spectrum.shape[0])
+    return spectrum.reshape(n_freqs, n_times), extent
+
+
+def plot_hilbert_spectrum(imfs, time_samples=None, fmax=None, fignum=None,
+                          power=False, cmap=None, show=True):
+    """Visualize the Hilbert spectrum of decomposed signals.
+
+    The spectrum is rasterized to the size of the axes in pixels by
+    :func:`hilbert_spectrum`, so the cost of drawing it does not depend on
+    the number and the length of the IMFs.
+
+    Parameters
+    ----------
+    imfs : array-like, shape (n_imfs, lenght_of_signal)
+        intrinsic mode functions of the signal, the last of which is the
+        residue and is left out
+
+    time_samples : array-like
+        (optional) uniformly spaced time instants
+
+    fmax : float
+        (optional) highest frequency displayed. (Default: the Nyquist
+        frequency)
+
+    fignum : int
+        (optional) number of the figure to display
+
+    power : bool
+        (optional) whether to display energy instead of amplitude.
+        (Default: ``False``)
+
+    cmap : str or matplotlib.colors.Colormap
+        (optional) colormap of the image
+
+    show : bool
+        (optional) whether to call ``plt.show()``. (Default: ``True``)
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+
+    Example:
+    -------
+
+    >>> plot_hilbert_spectrum(EMD(signal).decompose())
+    """
+    fig = plt.figure(num=fignum)
+    ax = fig.add_subplot(111)
+    bbox = ax.get_window_extent()
+    n_times, n_freqs = max(int(bbox.width), 1), max(int(bbox.height), 1)
+    spectrum, extent = hilbert_spectrum(imfs, time_samples, n_times, n_freqs,
+                                        fmax, power)
+    ax.imshow(spectrum, extent=extent, origin="lower", aspect="auto",
+              interpolation="nearest", cmap=cmap)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Frequency')
+    ax.set_title('Hilbert Spectrum')
+    if show:
+        plt.show()
+    return fig
+
+
+def plot_imfs(signal, imfs, time_samples=None, fignum=None, lod=True,
+              blit=False, show=True):
+    """Visualize decomposed signals.
+
+    Parameters
+    ----------
+    signal : array-like
+        Analyzed signal
+
+    time_samples : array-like
+        time instants
+
+    imfs : array-like, shape (n_imfs, lenght_of_signal)
+        intrinsic mode functions of the signal
+
+    fignum : int
+        (optional) number of the figure to display
+
+    lod : bool
+        (optional) whether to draw only the minimum and maximum of the
+        signals over each pixel-wide time bucket (see
+        :func:`minmax_decimate`), and recompute them for the visible range
+        when zooming. This makes the drawing cost independent of the length
+        of the signal. (Default: ``True``)
+
+    blit : bool
+        (optional) whether to redraw zoomed lines by blitting when the
+        backend supports it. Only used if ``lod`` is ``True``.
+        (Default: ``False``)
+
+    show : bool
+        (optional) whether to call ``plt.show()``. Use :func:`imfs_figure`
+        to build figures outside of pyplot altogether. (Default: ``True``)
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+
+    Example:
+    -------
+
+    >>> plot_imfs(signal)
+
+    .. plot:: ../../docs/examples/emd_fmsin.py
+    """
+    fig = plt.figure(num=fignum)
+    _draw_imfs(fig, signal, imfs, time_samples, lod=lod, blit=blit)
+    if show:
+        plt.show()
+    return fig
@@ -7,5 +7,8 @@ setup(
     version='0.0.1',
     author='Jaidev Deshpande',
     author_email='deshpande.jaidev@gmail.com',
-    packages=['pyhht']
+    packages=['pyhht'],
+    entry_points={
+        'console_scripts': ['pyhht = pyhht.cli:main'],
+    },
 )